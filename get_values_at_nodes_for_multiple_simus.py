@@ -42,27 +42,17 @@ common_data.verbose = args.verbose
 
 nodes = [1, 10, 100]  # liste de noeuds (numerotation à partir de 1 comme BlueKenue)
 
-with open(args.outcsv, 'w', newline='') as csvfile:
-    csvwriter = csv.writer(csvfile, delimiter=args.sep)
-    csvwriter.writerow(['file', 'time'] + nodes)
-
-    for slf_file in args.slf_list:
-        print(">>>>> FICHIER RESULTAT T2D : {} <<<<<".format(slf_file))
-        with Serafin.Read(slf_file) as resin:
-            resin.readHeader()
-
-            if resin.type != '2D':
-                sys.exit("The current script is working only with 2D meshes !")
-
-            resin.get_time()
-
-            for time in args.time:
-                try:
-                    print(resin.time.index(time))
-                except ValueError:
-                    print("/!\ Le temps {} n'est pas dans le fichier.".format(time))
-                    sys.exit("Temps possibles : {}".format(resin.time))
-
-                data = resin.read_var_in_frame(time, args.var)[[n+1 for n in nodes]]
-
-                csvwriter.writerow([slf_file, time] + list(data))
+if __name__ == '__main__':  # required by the pool of processes
+    # Files are read in parallel (results are in the order of the file list)
+    try:
+        results = Serafin.read_nodes_in_files(args.slf_list, nodes, [args.var], args.time, mesh_type='2D')
+    except ValueError as error:
+        sys.exit("/!\\ {}".format(error))
+
+    with open(args.outcsv, 'w', newline='') as csvfile:
+        csvwriter = csv.writer(csvfile, delimiter=args.sep)
+        csvwriter.writerow(['file', 'time'] + nodes)
+
+        for slf_file, (times, values) in zip(args.slf_list, results):
+            for time, data in zip(times, values[:, 0, :]):
+                csvwriter.writerow([slf_file, time] + data.astype('float64').tolist())
@@ -1,28 +1,87 @@
 # -*- coding: utf-8 -*-
 """
 Read/Write Serafin files and manipulate associated data
+
+Heavy dependencies (jinja2, matplotlib, pandas, shapely) are imported only by
+the methods which need them, to keep a fast startup of command line scripts.
 """
 
-from jinja2 import Environment, Template, FileSystemLoader
+import errno
+import io
 import math
-import matplotlib.tri as mtri
 import numpy as np
 import os
-import pandas as pd
-import shapely.geometry as geom
+import queue
 import struct
 import sys
+import threading
+from time import sleep
+import zipfile
 
-from .common_data import log, varTable, varUnit, varName
-from geom.dataset import BlueKenueRead_i2s
+from . import common_data
+from .common_data import log, varIDFromName, varUnit, varName
 
 # nodes and elements are 0-indexed in saved arrays !!!
 # nearest_node, ponderation => 1-indexed
 
+# Default dtypes of variable values and of connectivity tables (IKLE, IPOBO) in memory
+# (Serafin stores 4-byte values, larger types do not bring any precision)
+FLOAT_TYPE = 'float32'
+INT_TYPE = 'int32'
+
+# Default memory budget (in bytes) for blocks of frames read at once
+BLOCK_SIZE = 256 * 1024**2
+
+# Default size (in bytes) of the buffers written at once by Write.write_frames
+WRITE_BUFFER_SIZE = 64 * 1024**2
+
+# Default number of buffers (frames) waiting for the background writer thread of Write (see queue_size)
+WRITE_QUEUE_SIZE = 2
+
+# Default maximum number of worker processes of write_frames_in_parallel
+MAX_PROCESSES = 4
+
+# Maximum gap (in number of nodes) between two target nodes read with a single call
+NODE_GAP = 1024
+
+# Default number of frames read in advance by Read.iter_frames
+PREFETCH = 2
+
+# Sidecar index file (decoded header and time serie), named as the Serafin file + extension
+SIDECAR_EXT = '.slfidx'
+SIDECAR_VERSION = 1
+
+# Statistics index file (min/max/mean/NaN count per frame and variable), named as the Serafin file + extension
+STATS_EXT = '.slfstats'
+STATS_VERSION = 2
+STATS = ['min', 'max', 'mean', 'nan']
+
+# Snapshot of the bytes overwritten by Patch (to restore the file), named as the Serafin file + extension
+SNAPSHOT_EXT = '.undo'
+SNAPSHOT_RECORD = struct.Struct('<QQ')  # position and length (in bytes) of the overwritten data
+
+# Policies to resolve overlapping times of successive files (restarts): keep the frames of the first or
+# the last file which contains them, or raise an error
+OVERLAP_POLICIES = ['first', 'last', 'error']
 
-# For LandXML export
-env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')))
-template = env.get_template("LandXML_template.xml")
+# List of Serafin files read as a single one by MultiRead (one filename per line, relative to the list file)
+MULTI_EXT = '.slflist'
+
+# Default maximum number of files opened at the same time by MultiRead
+MAX_OPEN_FILES = 16
+
+# Filename of the standard input (Read) or output (Write), to pipe Serafin data between scripts
+STDIO = '-'
+
+# Default delay (in seconds) between two checks of a Serafin file which is being written
+FOLLOW_INTERVAL = 5.
+
+
+def LandXML_template():
+    """Load template for LandXML export"""
+    from jinja2 import Environment, FileSystemLoader
+    env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')))
+    return env.get_template("LandXML_template.xml")
 
 
 class Serafin:
@@ -30,20 +89,62 @@ class Serafin:
 
     lang = 'fr'  # FIXME: automatic detection?
 
-    def __init__(self, filename, mode):
-        self.fileName = filename
+    def __init__(self, filename, mode, dtype=FLOAT_TYPE):
+        """
+        @param filename <str, path-like or file object>: path, STDIO for standard input/output or binary file object
+          (a file object is not closed at exit)
+        """
+        if isinstance(filename, str) and filename == STDIO:
+            filename = sys.stdin.buffer if 'r' in mode else sys.stdout.buffer
+        if isinstance(filename, (str, os.PathLike)):
+            self.fileName = os.fspath(filename)
+            self._fileobj = None
+        elif hasattr(filename, 'read') or hasattr(filename, 'write'):
+            name = getattr(filename, 'name', None)
+            self.fileName = name if isinstance(name, str) else '<stream>'  # file descriptor (int) of a pipe
+            self._fileobj = filename
+        else:
+            raise TypeError("{!r} is neither a path nor a file object".format(filename))
         self.mode = mode
+        self.dtype = np.dtype(dtype)
+        self._node_layout = None
+
+    @property
+    def node_layout(self):
+        """
+        Node positions (0-indexed) by plane, as a numpy 2D-array with shape (nb plane, nb node 2D)
+        (a single plane for a 2D result). 3D nodes are numbered plane by plane, so the 3D nodes
+        above the 2D node `node` (1-indexed) are node_layout[:, node - 1]
+        """
+        if self._node_layout is None or self._node_layout.size != self.nnode:
+            self._node_layout = np.arange(self.nnode).reshape(-1, self.nnode2d)
+        return self._node_layout
+
+    def by_plane(self, values):
+        """
+        @brief: view values by plane (without copy)
+        @param values <numpy array>: values with nodes on the last axis, e.g. a frame with shape (nb var, nb node)
+        @return <numpy array>: shape = (..., nb plane, nb node 2D), e.g. (nb var, nb plane, nb node 2D) for a frame
+        """
+        values = np.asarray(values)
+        return values.reshape(values.shape[:-1] + self.node_layout.shape)
 
     # Handle properly opening and exiting of Serafin file
     # through a "with ... as ..." statement
     def __enter__(self):
         log(">>> Open {} in '{}' mode".format(self.fileName, self.mode))
-        self.file = open(self.fileName, self.mode)
+        if self._fileobj is None:
+            self.file = open(self.fileName, self.mode)
+        else:
+            self.file = self._fileobj
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         log("<<< Close {}".format(self.fileName))
-        self.file.close()
+        if self._fileobj is None:
+            self.file.close()
+        else:
+            self.file.flush()
         return False
 
     # ~> General function for interpolation
@@ -83,6 +184,8 @@ class Serafin:
         Return element number containing target point (1-indexed)
         If not in the domain return -1
         """
+        import shapely.geometry as geom
+
         # FIXME: optimize => check if inside domain firstly?
         square_dist_to_bary = np.power(self.x_bary - target_x, 2) + np.power(self.y_bary - target_y, 2)  # minimize square root is not necessary
         elements_ordered = np.argsort(square_dist_to_bary)+1  # +1 because it was 0-indexed
@@ -160,6 +263,8 @@ class Serafin:
         #
         # local: df_points
         # global: df_poly, df_all_points
+        import pandas as pd
+        from geom.dataset import BlueKenueRead_i2s
 
         final = []
         df_poly = pd.DataFrame()
@@ -205,6 +310,12 @@ class Serafin:
         else:
             return True
 
+    def identicalMesh(self, other):
+        """Check if the mesh is identical to another Serafin object (connectivity, boundary nodes and coordinates)"""
+        return self.sameMesh(other) and self.nplan == other.nplan and self.ndp == other.ndp \
+            and np.array_equal(self.ikle, other.ikle) and np.array_equal(self.ipobo, other.ipobo) \
+            and np.array_equal(self.x, other.x) and np.array_equal(self.y, other.y)
+
     def sameVarID(self, other):
         """Check if variables lists are similar"""
         return all(self.varID == other.varID)
@@ -220,9 +331,10 @@ class Serafin:
 
     def commonTime(self, other):
         """Return common time serie with another other object"""
+        other_time = set(other.time)
         timeSerie = []
         for time in self.time:
-            if time in other.time:
+            if time in other_time:
                 timeSerie.append(time)
         return timeSerie
 
@@ -277,8 +389,7 @@ class Serafin:
         @brief: toto
         /!\ pos => 0-indexed (not a frame id!)
         """
-        time = self.time[pos]
-        data = self.read_var_in_frame(time, var)
+        data = self.read_var_in_frame_at_pos(pos, var)
 
         if shift is None:
             values_at_nodes = np.column_stack((self.x, self.y, data))
@@ -286,7 +397,7 @@ class Serafin:
             values_at_nodes = np.column_stack((self.x + shift[0], self.y + shift[1], data))
         triangles = self.ikle2d
 
-        template_render = template.render(
+        template_render = LandXML_template().render(
             nodes = np.round(values_at_nodes, digits),
             ikle = self.ikle2d
         )
@@ -302,12 +413,15 @@ class Serafin:
 
     def compute_triangulation(self):
         """..."""
+        import matplotlib.tri as mtri
         self.triang = mtri.Triangulation(self.x, self.y, self.ikle2d-1)
         self.triang_neighbors = self.triang.neighbors + 1 # 1-indexed
 
 
     def iter_intersect_segment(self, xa, ya, xb, yb):
         """"REQUIRE compute_element_barycenters and triangulation..."""
+        import shapely.geometry as geom
+
         # Ajout A
         ptA = (xa, ya)
         ptB = (xb, yb)
@@ -392,14 +506,92 @@ class Serafin:
 class Read(Serafin):
     """Read Serafin binary file"""
 
-    def __init__(self, filename):
-        Serafin.__init__(self, filename, 'rb')
-        self.fileSize = os.path.getsize(self.fileName)
+    raw_frames = True  # frames are stored as Serafin records (they can be copied without decoding)
+
+    def __new__(cls, filename=None, *args, **kwargs):
+        # A list of Serafin files (MULTI_EXT) is read as a single file
+        if cls is Read and isinstance(filename, (str, os.PathLike)) and os.fspath(filename).endswith(MULTI_EXT):
+            return object.__new__(MultiRead)
+        return object.__new__(cls)
+
+    def __init__(self, filename, dtype=FLOAT_TYPE, sidecar=None):
+        """
+        @param dtype <str>: type of the returned variable values (FLOAT_TYPE by default)
+        @param sidecar <bool>: use of the sidecar index file (filename + SIDECAR_EXT):
+          * None: used if it exists (and rebuilt if the Serafin file was modified)
+          * True: used and built if necessary
+          * False: ignored
+        A file object which is not seekable (e.g. standard input) is read in streaming mode: frames are
+        only read sequentially (by iter_frames or iter_frame_blocks) and the time serie is completed
+        while frames are read (no sidecar index is used for a file object)
+        """
+        Serafin.__init__(self, filename, 'rb', dtype)
+        if self._fileobj is None:
+            self._stat = os.stat(self.fileName)
+            self.fileSize = self._stat.st_size
+            self.sidecarName = self.fileName + SIDECAR_EXT
+            self.statsName = self.fileName + STATS_EXT
+        else:
+            # No sidecar or statistics index next to a file object
+            self._stat = None
+            self.fileSize = None  # known at opening if the file object is seekable
+            sidecar = False
+            self.sidecarName = None
+            self.statsName = None
+        self.streaming = False
+        self.sidecar = sidecar
+        self._sidecar_loaded = False
+        self._time = None
+        self.stats = None
+
+    def __enter__(self):
+        Serafin.__enter__(self)
+        if self._fileobj is not None:
+            self.streaming = not self.file.seekable()
+            if not self.streaming:
+                self.fileSize = self.file.seek(0, 2)
+                self.file.seek(0, 0)
+        return self
+
+    @property
+    def time(self):
+        """Time serie (in seconds) as a list, read at first access if get_time was not called"""
+        self._load_time()
+        return self._time
+
+    @property
+    def time_array(self):
+        """Time serie (in seconds) as a numpy array (same order as time)"""
+        self._load_time()
+        return self._time_array
+
+    def _load_time(self):
+        if self._time is None:
+            self.get_time()
 
     def readHeader(self):
         """
         @brief: read header (file caracteristics) and assign attributes
         Attributes assigned: title, nbvar, nbvar2... TOCOMPLETE
+        The header and the time serie are taken from the sidecar index if it is valid
+        """
+        if self.sidecar is not False and self._load_sidecar():
+            log("Header and time serie loaded from {}".format(self.sidecarName))
+        else:
+            self._read_header_records()
+            self._compute_header_attributes()
+            if self.streaming:
+                self._time = []  # completed while frames are read
+                self._build_time_index()
+            if self.sidecar or (self.sidecar is None and os.path.exists(self.sidecarName)):
+                self.get_time()
+                self._write_sidecar()
+
+        log("{} result (with {} plans)".format(self.type, self.nplan))
+
+    def _read_header_records(self):
+        """
+        @brief: read header records from the file
         """
         # Read title
         self.file.read(4)
@@ -440,36 +632,36 @@ class Read(Serafin):
 
         self._var_i = struct.unpack('>i', self.file.read(4))[0]  # not interesting value?
         self.file.read(4)
-        if self.nplan != 0:
-            self.nnode2d = int(self.nnode/self.nplan)
-        else:
-            self.nnode2d = self.nnode
 
         # IKLE
         self.file.read(4)
-        nb_val = '>%ii' % (self.nelem * self.ndp)
-        self.ikle = np.array(struct.unpack(nb_val, self.file.read(4 * self.nelem * self.ndp)))
+        self.ikle = self._read_values(self.nelem * self.ndp, '>i4').astype(INT_TYPE)
         self.file.read(4)
 
         # IPOBO
         self.file.read(4)
-        nb_val = '>%ii' % self.nnode
-        self.ipobo = np.array(struct.unpack(nb_val, self.file.read(4 * self.nnode)))
-        # self.ipobo = self.ipobo.astype(int) # FIXME: bricolage pour integer
+        self.ipobo = self._read_values(self.nnode, '>i4').astype(INT_TYPE)
         self.file.read(4)
 
         # x coordinates
         self.file.read(4)
-        nb_val = '>%if' % self.nnode
-        self.x = np.array(struct.unpack(nb_val, self.file.read(4 * self.nnode)))
+        self.x = self._read_values(self.nnode, '>f4').astype('float64')
         self.file.read(4)
 
         # y coordinates
         self.file.read(4)
-        nb_val = '>%if' % self.nnode
-        self.y = np.array(struct.unpack(nb_val, self.file.read(4 * self.nnode)))
+        self.y = self._read_values(self.nnode, '>f4').astype('float64')
         self.file.read(4)
 
+    def _compute_header_attributes(self):
+        """
+        @brief: deduce attributes (sizes, type, varID, ikle2d...) from header records
+        """
+        if self.nplan != 0:
+            self.nnode2d = int(self.nnode/self.nplan)
+        else:
+            self.nnode2d = self.nnode
+
         # Header size
         self.headerSize = (80 + 8) + (8 + 8) + (self._nbvar * (8 + 32)) + (40 + 8) + (
             self._param[-1] * ((6 * 4) + 8)) + (16 + 8) + ((int(self.nelem) * self.ndp * 4) + 8) + (
@@ -478,8 +670,11 @@ class Read(Serafin):
         # Frame size (all variable values for one time step)
         self.frameSize = 12 + (self._nbvar * (8 + int(self.nnode) * 4))
 
-        # Deduce number of frames (integer division)
-        self.nb_frame = (self.fileSize - self.headerSize) // self.frameSize
+        # Deduce number of frames (integer division), counted while frames are read in streaming mode
+        if self.streaming:
+            self.nb_frame = 0
+        else:
+            self.nb_frame = (self.fileSize - self.headerSize) // self.frameSize
 
         # Deduce type
         if self.ndp == 3 and self.nplan is 0:
@@ -492,10 +687,9 @@ class Read(Serafin):
         # Deduce varID (abbreviation of variables)
         self.varID = []
         for varName in self.varNames:
-            for varID, line in varTable(self.type).iterrows():  #FIXME: optimiser le parcours du tableau
-                if line[Serafin.lang] == varName.decode(encoding='utf-8'):
-                    self.varID.append(varID)
-                    break
+            varID = varIDFromName(self.type, Serafin.lang, varName.decode(encoding='utf-8'))
+            if varID is not None:
+                self.varID.append(varID)
         if len(self.varID) != len(self.varNames):
             print(self.varNames)
             print(self.varID)
@@ -504,26 +698,204 @@ class Read(Serafin):
         # Build ikle2d
         ikle = self.ikle.reshape(self.nelem, self.ndp)  #FIXME npd en 2d?
         if self.type == '3D':
-            # FIXME: bricolage pour avoir un ikle2d a partir du 3D
-            self.ikle2d = np.empty([int(self.nelem/(self.nplan-1)), 3], dtype=int)  #FIXME: avoid int() function here (check the result should be always an integer)
-            for i, line in enumerate(self.ikle2d):
-                self.ikle2d[i] = ikle[i, np.array([0,1,2])]  # in bottom frame
+            # Prisms of the first layer are numbered first: their bottom triangles form the 2D mesh
+            nelem2d = self.nelem // (self.nplan - 1)
+            self.ikle2d = ikle[:nelem2d, :3].copy()
         else:
             self.ikle2d = ikle
 
-        log("{} result (with {} plans)".format(self.type, self.nplan))
+    def _load_sidecar(self):
+        """
+        @brief: assign header attributes and time serie from the sidecar index
+        @return <bool>: False if the sidecar index is missing, unreadable or outdated
+        """
+        try:
+            with np.load(self.sidecarName) as index:
+                if int(index['version']) != SIDECAR_VERSION or int(index['file_size']) != self._stat.st_size \
+                        or int(index['file_mtime']) != self._stat.st_mtime_ns:
+                    return False
+                self.title = index['title'].tobytes()
+                self._nbvar = int(index['nbvar'])
+                self._nbvar2 = int(index['nbvar2'])
+                names = index['var_names'].tobytes()
+                units = index['var_units'].tobytes()
+                self.varNames = [names[16*i:16*(i+1)] for i in range(self._nbvar)]
+                self.varUnits = [units[16*i:16*(i+1)] for i in range(self._nbvar)]
+                self._param = tuple(int(x) for x in index['param'])
+                self.nplan = self._param[6]
+                if self._param[-1] == 1:
+                    self.date = tuple(int(x) for x in index['date'])
+                self.nelem = int(index['nelem'])
+                self.nnode = int(index['nnode'])
+                self.ndp = int(index['ndp'])
+                self._var_i = int(index['var_i'])
+                self.ikle = index['ikle'].astype(INT_TYPE)
+                self.ipobo = index['ipobo'].astype(INT_TYPE)
+                self.x = index['x'].astype('float64')
+                self.y = index['y'].astype('float64')
+                time = index['time'].tolist()
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return False
+
+        self._compute_header_attributes()
+        if len(time) != self.nb_frame:
+            return False
+        self._time = time
+        self._build_time_index()
+        self._sidecar_loaded = True
+        self.file.seek(self.headerSize, 0)  # as if the header was read
+        return True
+
+    def _write_sidecar(self):
+        """
+        @brief: write the sidecar index (decoded header, time serie, frame offsets and validity stamp)
+        A failure (e.g. read-only folder) is not an error: the Serafin file is read as usual
+        """
+        tmp_name = self.sidecarName + '.tmp'
+        try:
+            with open(tmp_name, 'wb') as fileout:
+                np.savez(fileout, version=SIDECAR_VERSION,
+                         file_size=self._stat.st_size, file_mtime=self._stat.st_mtime_ns,
+                         title=np.frombuffer(self.title, dtype=np.uint8),
+                         nbvar=self._nbvar, nbvar2=self._nbvar2,
+                         var_names=np.frombuffer(b''.join(self.varNames), dtype=np.uint8),
+                         var_units=np.frombuffer(b''.join(self.varUnits), dtype=np.uint8),
+                         param=np.array(self._param, dtype='int32'),
+                         date=np.array(self.date if self._param[-1] == 1 else [], dtype='int32'),
+                         nelem=self.nelem, nnode=self.nnode, ndp=self.ndp, var_i=self._var_i,
+                         ikle=self.ikle.astype('int32'), ipobo=self.ipobo.astype('int32'),
+                         x=self.x.astype('float32'), y=self.y.astype('float32'),
+                         time=self._time_array,
+                         frame_offsets=self.headerSize + np.arange(self.nb_frame, dtype='int64') * self.frameSize)
+            os.replace(tmp_name, self.sidecarName)
+            log("Write sidecar index {}".format(self.sidecarName))
+        except OSError as error:
+            log("WARNING: sidecar index could not be written ({})".format(error))
 
     def get_time(self):
         """
         @brief: assign time serie (in seconds) in a list
+        The time of every frame is gathered in a single strided pass over the mapped file
         """
-        self.file.seek(self.headerSize, 0)
-        self.time = []
-        for i in range(self.nb_frame):
-            self.file.read(4)
-            self.time.append(struct.unpack('>f', self.file.read(4))[0])
-            self.file.read(4)
-            self.file.seek(self.frameSize - 12, 1)
+        if self._sidecar_loaded or self.streaming:
+            return  # already loaded from the sidecar index (or read with the frames in streaming mode)
+        if self.nb_frame == 0:
+            self._time = []
+        elif self._fileobj is not None:
+            # No memory mapping of a file object: time records are read one by one
+            self._time = []
+            for pos in range(self.nb_frame):
+                self.file.seek(self.headerSize + pos * self.frameSize + 4, 0)
+                self._time.append(float(self._read_values(1, '>f4')[0]))
+        else:
+            self._time = self._memmap_frames()[:, 1].astype('float64').tolist()
+        self._build_time_index()
+
+    def _build_time_index(self):
+        """
+        @brief: build lookup structures of the time serie
+        Attributes assigned: time_array (numpy array, same order as time) and private
+        hash index (exact lookup) and sorted copy (nearest and bracketing lookups)
+        """
+        self._time_array = np.array(self._time, dtype='float64')
+        self._time_index = {}
+        for pos, time in enumerate(self._time):
+            self._time_index.setdefault(time, pos)  # keep first occurrence (like list.index)
+        self._time_order = np.argsort(self._time_array, kind='stable')
+        self._time_sorted = self._time_array[self._time_order]
+
+    def get_time_index(self, time):
+        """
+        @brief: position of a frame from its exact time (constant time lookup)
+        @param time <float>: simulation time (in seconds)
+        @return <int>: frame position (0-indexed)
+        """
+        self._load_time()
+        try:
+            return self._time_index[time]
+        except KeyError:
+            raise ValueError("time {} is not in {}".format(time, self.fileName))
+
+    def get_nearest_time_index(self, time):
+        """
+        @brief: position of the frame with the closest time (the first one if equidistant)
+        @param time <float>: simulation time (in seconds)
+        @return <int>: frame position (0-indexed)
+        """
+        self._load_time()
+        if self.nb_frame == 0:
+            raise ValueError("no frame in {}".format(self.fileName))
+        i = int(np.searchsorted(self._time_sorted, time))
+        candidates = [j for j in (i - 1, i) if 0 <= j < len(self._time_sorted)]
+        j = min(candidates, key=lambda j: (abs(self._time_sorted[j] - time), self._time_order[j]))
+        return int(self._time_order[j])
+
+    def get_bracketing_time_indexes(self, time):
+        """
+        @brief: positions of the two frames surrounding a time (bisection)
+        @param time <float>: simulation time (in seconds)
+        @return <tuple of 2 int>: frame positions (before, after) with time(before) <= time <= time(after)
+          (both positions are identical for an exact match)
+        """
+        self._load_time()
+        i = int(np.searchsorted(self._time_sorted, time, side='left'))
+        if i < len(self._time_sorted) and self._time_sorted[i] == time:
+            pos = int(self._time_order[i])
+            return (pos, pos)
+        if i == 0 or i == len(self._time_sorted):
+            raise ValueError("time {} is outside the time range of {}".format(time, self.fileName))
+        return (int(self._time_order[i - 1]), int(self._time_order[i]))
+
+    def _memmap_frames(self):
+        """
+        @brief: map the frames as a 2D-array of raw big-endian 4-byte values
+        @return <numpy.memmap>: shape = (nb frame, frame size / 4)
+        """
+        return np.memmap(self.fileName, dtype='>f4', mode='r', offset=self.headerSize,
+                         shape=(self.nb_frame, self.frameSize // 4))
+
+    def as_memmap(self):
+        """
+        @brief: map all the frames of the file in memory (nothing is read before slicing)
+        Fortran record markers (and time records) are skipped with strides, so any slice
+        by frame, variable and/or node is a view which only pages in the bytes it touches
+        @return var <numpy 3D-array>: read-only big-endian view, shape = (nb frame, nb var, nb node)
+        """
+        if self.nb_frame == 0:
+            return np.empty([0, self._nbvar, self.nnode], dtype='>f4')
+        # Each frame is: time record (3 values) + nbvar records of (nnode + 2) values
+        return self._memmap_frames()[:, 3:].reshape(self.nb_frame, self._nbvar, self.nnode + 2)[:, :, 1:-1]
+
+    def _read_values(self, nb_val, dtype='>f4', file=None):
+        """
+        @brief: read raw bytes of nb_val big-endian values and decode them at once
+        @param nb_val <int>: number of values to read
+        @param dtype <str>: big-endian numpy dtype of the values ('>f4' or '>i4')
+        @param file <file object>: opened file to read (self.file by default)
+        @return <numpy 1D-array>: read-only array (use astype to get a native copy)
+        """
+        if file is None:
+            file = self.file
+        return np.frombuffer(file.read(4 * nb_val), dtype=dtype, count=nb_val)
+
+    def _frame_offset(self, pos):
+        """
+        @brief: position in bytes of the first variable record of a frame
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        """
+        if self.streaming:
+            raise io.UnsupportedOperation("frames can only be read sequentially in streaming mode (use iter_frames)")
+        if pos < 0:
+            pos += self.nb_frame
+        if not 0 <= pos < self.nb_frame:
+            raise IndexError("frame position {} is not in range [0, {}[".format(pos, self.nb_frame))
+        return self.headerSize + pos * self.frameSize + 12
+
+    def _var_offset(self, pos, pos_var):
+        """
+        @brief: position in bytes of the values of a variable in a frame (after record marker)
+        """
+        return self._frame_offset(pos) + pos_var * (4 + 4 * self.nnode + 4) + 4
 
     def read_entire_frame(self, time2read):
         """
@@ -531,21 +903,42 @@ class Read(Serafin):
         @param time2read <float>: simulation time (in seconds) of the target frame
         @return var <numpy 2D-array>: shape = (nb var, nb node)
         """
-        nb_val = '>%if' % (self.nnode)
         try:
-            pos_time2read = self.time.index(time2read)
-        except IndexError:
-            print("ERROR: possible variables are {}".format(self.varID))
-            sys.exit(1)
+            pos_time2read = self.get_time_index(time2read)
+        except ValueError as error:
+            sys.exit("ERROR: {}".format(error))
+        return self.read_entire_frame_at_pos(pos_time2read)
 
-        var = np.empty([self._nbvar, self.nnode], dtype='float64')
+    def read_entire_frame_at_pos(self, pos):
+        """
+        @brief: read an entire frame (all the variables)
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        @return var <numpy 2D-array>: shape = (nb var, nb node)
+        """
+        return self._read_frame_values(pos, list(range(self._nbvar)))
 
-        self.file.seek(self.headerSize + pos_time2read * self.frameSize + 12, 0)
-        for pos_var in range(self._nbvar):
-            self.file.read(4)
-            var[pos_var] = struct.unpack(nb_val, self.file.read(4 * self.nnode))
-            self.file.read(4)
+    def _read_frame_values(self, pos, pos_vars, file=None):
+        """
+        @brief: read variables of a frame (all the variable records are read with a single call
+          if all the variables are requested in the file order)
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        @param pos_vars <int list>: positions of the target variables in the frame
+        @param file <file object>: opened file to read (self.file by default)
+        @return var <numpy 2D-array>: shape = (nb target var, nb node)
+        """
+        if file is None:
+            file = self.file
 
+        if pos_vars == list(range(self._nbvar)):
+            # Read all variable records (with their markers) and drop the markers
+            file.seek(self._frame_offset(pos), 0)
+            data = self._read_values(self._nbvar * (self.nnode + 2), '>f4', file).reshape(self._nbvar, self.nnode + 2)
+            return data[:, 1:-1].astype(self.dtype)
+
+        var = np.empty([len(pos_vars), self.nnode], dtype=self.dtype)
+        for i, pos_var in enumerate(pos_vars):
+            file.seek(self._var_offset(pos, pos_var), 0)
+            var[i] = self._read_values(self.nnode, '>f4', file)
         return var
 
     def read_var_in_frame(self, time2read, varID):
@@ -555,19 +948,23 @@ class Read(Serafin):
         @param varID <str>: variable ID
         @return var <numpy 1D-array>: size = nb node
         """
-        nb_val = '>%if' % (self.nnode)
-        pos_time2read = self.time.index(time2read)
-        var = np.empty(self.nnode, dtype='float64')
+        log("read_var_in_frame (var={}): {}".format(varID, time2read))
+        return self.read_var_in_frame_at_pos(self.get_time_index(time2read), varID)
+
+    def read_var_in_frame_at_pos(self, pos, varID):
+        """
+        @brief: read a single variable in a frame
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        @param varID <str>: variable ID
+        @return var <numpy 1D-array>: size = nb node
+        """
         try:
             pos_var = self.varID.index(varID)
         except ValueError:
             print("ERROR: possible variables are {}".format(self.varID))
             sys.exit(1)
 
-        log("read_var_in_frame (var={}): {}".format(varID, time2read))
-        self.file.seek(self.headerSize + pos_time2read * self.frameSize + 12 + pos_var * (4 + 4 * self.nnode + 4), 0)
-        self.file.read(4)
-        return np.array(struct.unpack(nb_val, self.file.read(4 * self.nnode)))
+        return self._read_frame_values(pos, [pos_var])[0]
 
     def read_vars_in_frame(self, time2read, varID_list):
         """
@@ -576,40 +973,450 @@ class Read(Serafin):
         @param varID_list <str list>: list of variable ID
         @return var <numpy 2D-array>: shape = (nb target var, nb node)
         """
-        nb_val = '>%if' % self.nnode
-        pos_time2read = self.time.index(time2read)
-        var = np.empty([len(varID_list), self.nnode], dtype='float64')
+        log("read_vars_in_frame (var={}): {}".format(varID_list, time2read))
+        return self.read_vars_in_frame_at_pos(self.get_time_index(time2read), varID_list)
+
+    def read_vars_in_frame_at_pos(self, pos, varID_list):
+        """
+        @brief: read selected variables in a frame
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        @param varID_list <str list>: list of variable ID
+        @return var <numpy 2D-array>: shape = (nb target var, nb node)
+        """
+        return self._read_frame_values(pos, self._pos_vars(varID_list))
 
+    def _pos_vars(self, varID_list):
+        """
+        @brief: positions of variables in a frame
+        @param varID_list <str list>: list of variable ID
+        """
         if isinstance(varID_list, list):
-            pos_vars = [self.varID.index(varID) for varID in varID_list]
+            return [self.varID.index(varID) for varID in varID_list]
         else:
             sys.exit("varID_list doit etre une liste ! Utiliser read_var_in_frame a la place")
 
-        log("read_vars_in_frame (var={}): {}".format(varID_list, time2read))
-        for i, pos_var in enumerate(pos_vars):
-            self.file.seek(self.headerSize + pos_time2read * self.frameSize + 12 + pos_var * (4 + 4 * self.nnode + 4),
-                           0)
-            self.file.read(4)
-            var[i] = struct.unpack(nb_val, self.file.read(4 * self.nnode))
+    def read_frames(self, start=0, stop=None, step=1, varID_list=None):
+        """
+        @brief: read a block of frames (contiguous frames are read with a single call)
+        @param start, stop, step <int>: frame positions, same meaning as for a slice
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @return var <numpy 3D-array>: shape = (nb frame, nb target var, nb node)
+        """
+        positions = range(self.nb_frame)[start:stop:step]
+        if varID_list is None:
+            varID_list = self.varID
+        pos_vars = self._pos_vars(varID_list)
+        nb_val = self.frameSize // 4
+
+        if len(positions) == 0:
+            return np.empty([0, len(pos_vars), self.nnode], dtype=self.dtype)
+        if positions.step == 1:
+            self.file.seek(self.headerSize + positions[0] * self.frameSize, 0)
+            data = self._read_values(len(positions) * nb_val, '>f4').reshape(len(positions), nb_val)
+        else:
+            data = np.empty([len(positions), nb_val], dtype='>f4')
+            for i, pos in enumerate(positions):
+                self.file.seek(self.headerSize + pos * self.frameSize, 0)
+                data[i] = self._read_values(nb_val, '>f4')
+
+        # Drop time records and Fortran markers and decode all the values at once
+        var = data[:, 3:].reshape(len(positions), self._nbvar, self.nnode + 2)[:, :, 1:-1]
+        if pos_vars != list(range(self._nbvar)):
+            var = var[:, pos_vars, :]
+        return var.astype(self.dtype)
+
+    def iter_frames(self, varID_list=None, pos_list=None, prefetch=PREFETCH):
+        """
+        @brief: iterate over frames which are read in advance by a background thread
+        Reading of the next frames (up to prefetch) overlaps computations on the current one.
+        The thread uses its own file handle, so other read methods can be called meanwhile.
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @param pos_list <int list>: frame positions (all frames if None)
+        @param prefetch <int>: maximum number of frames read in advance (0 to read in the loop)
+        @return <generator>: (time, numpy 2D-array with shape (nb target var, nb node))
+        """
+        if varID_list is None:
+            varID_list = self.varID
+        pos_vars = self._pos_vars(varID_list)
+
+        if self.streaming:
+            # Frames are read sequentially (frames which are not in pos_list are skipped)
+            last_pos = None if pos_list is None else max(pos_list, default=-1)
+            pos_set = None if pos_list is None else set(pos_list)
+            if last_pos == -1:
+                return
+            for pos, time, values in self._iter_stream(pos_vars):
+                if pos_set is None or pos in pos_set:
+                    yield (time, values)
+                if pos == last_pos:
+                    return  # the end of the stream is not read
+            return
+
+        if pos_list is None:
+            pos_list = range(self.nb_frame)
+        times = [self.time[pos] for pos in pos_list]
+
+        if prefetch <= 0 or self._fileobj is not None:  # a file object can not be opened by the thread
+            for time, pos in zip(times, pos_list):
+                yield (time, self._read_frame_values(pos, pos_vars))
+            return
+
+        frames = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            # Wait for a free place in the queue unless the iteration was stopped
+            while not stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
 
-        return var
+        def read_frames():
+            try:
+                with open(self.fileName, 'rb') as file:
+                    for pos in pos_list:
+                        if not put((None, self._read_frame_values(pos, pos_vars, file))):
+                            return
+            except Exception as error:
+                put((error, None))
+                return
+            put((None, None))  # end of iteration
+
+        thread = threading.Thread(target=read_frames, daemon=True)
+        thread.start()
+        try:
+            for time in times:
+                error, values = frames.get()
+                if error is not None:
+                    raise error
+                yield (time, values)
+        finally:
+            stop.set()
+            thread.join()
+
+    def refresh(self):
+        """
+        @brief: update the number of frames (and the time serie) of a file which is being written
+        A partially written frame at the end of the file is ignored
+        @return <int>: number of new frames
+        """
+        if self._fileobj is not None:
+            raise io.UnsupportedOperation("a file object (or standard input) can not be refreshed")
+        self._stat = os.fstat(self.file.fileno())
+        self.fileSize = self._stat.st_size
+        nb_frame = max(0, (self.fileSize - self.headerSize) // self.frameSize)
+        nb_new = nb_frame - self.nb_frame
+        if nb_new > 0:
+            old_nb_frame = self.nb_frame
+            self.nb_frame = nb_frame
+            if self._time is not None:
+                self._time += self._memmap_frames()[old_nb_frame:, 1].astype('float64').tolist()
+                self._build_time_index()
+            log("{} new frame(s) in {}".format(nb_new, self.fileName))
+        return max(0, nb_new)
+
+    def follow(self, varID_list=None, start=0, interval=FOLLOW_INTERVAL, timeout=None):
+        """
+        @brief: iterate over frames as soon as they are completely written (e.g. by a running computation)
+        Frames already in the file are yielded first, then the file size is checked every
+        `interval` seconds to find new frames
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @param start <int>: position of the first frame
+        @param interval <float>: delay (in seconds) between two checks of the file size
+        @param timeout <float>: stop after this duration (in seconds) without any new frame (never if None)
+        @return <generator>: (time, numpy 2D-array with shape (nb target var, nb node))
+        """
+        if varID_list is None:
+            varID_list = self.varID
+        pos = start
+        idle = 0.
+        while True:
+            if pos < self.nb_frame:
+                yield (self.time[pos], self.read_vars_in_frame_at_pos(pos, varID_list))
+                pos += 1
+                idle = 0.
+            elif timeout is not None and idle >= timeout:
+                return
+            else:
+                sleep(interval)
+                idle += interval
+                self.refresh()
+
+    def read_nodes(self, nodes, varID_list=None, pos_list=None, max_gap=NODE_GAP):
+        """
+        @brief: read time series of variables at a subset of nodes (without reading entire frames)
+        Byte offsets of the target nodes are computed for every frame and neighbouring nodes
+        (separated by less than max_gap nodes) are read with a single call
+        @param nodes <int list>: node numbers (1-indexed)
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @param pos_list <int list>: frame positions (all frames if None)
+        @param max_gap <int>: maximum number of unused nodes read to join two target nodes
+        @return var <numpy 3D-array>: shape = (nb frame, nb target var, nb target node)
+        """
+        if varID_list is None:
+            varID_list = self.varID
+        if pos_list is None:
+            pos_list = range(self.nb_frame)
+        pos_vars = self._pos_vars(varID_list)
+
+        index = np.asarray(nodes, dtype=int) - 1
+        if len(index) > 0 and (index.min() < 0 or index.max() >= self.nnode):
+            raise IndexError("node numbers should be in range [1, {}]".format(self.nnode))
+        unique_index, inverse = np.unique(index, return_inverse=True)
+
+        # Coalesce neighbouring nodes: (first node, number of nodes to read, target nodes in run)
+        runs = []
+        for run in np.split(unique_index, np.where(np.diff(unique_index) > max_gap)[0] + 1):
+            if len(run) > 0:
+                runs.append((run[0], run[-1] - run[0] + 1, run - run[0]))
+
+        var = np.empty([len(pos_list), len(pos_vars), len(unique_index)], dtype=self.dtype)
+        for i, pos in enumerate(pos_list):
+            for j, pos_var in enumerate(pos_vars):
+                offset = self._var_offset(pos, pos_var)
+                col = 0
+                for first, nb_val, members in runs:
+                    self.file.seek(offset + 4 * first, 0)
+                    var[i, j, col:col + len(members)] = self._read_values(nb_val, '>f4')[members]
+                    col += len(members)
+
+        return var[:, :, inverse.ravel()]
+
+    def iter_frame_blocks(self, varID_list=None, start=0, stop=None, step=1, block_size=BLOCK_SIZE):
+        """
+        @brief: iterate over blocks of frames read with read_frames
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @param start, stop, step <int>: frame positions, same meaning as for a slice
+        @param block_size <int>: memory budget (in bytes) of the data read for a block
+        @return <generator>: (list of times, numpy 3D-array with shape (nb frame, nb target var, nb node))
+        """
+        nb_frame_per_block = max(1, block_size // self.frameSize)
+        if self.streaming:
+            yield from self._iter_stream_blocks(varID_list, start, stop, step, nb_frame_per_block)
+            return
+
+        positions = range(self.nb_frame)[start:stop:step]
+        for i in range(0, len(positions), nb_frame_per_block):
+            block = positions[i:i + nb_frame_per_block]
+            times = [self.time[pos] for pos in block]
+            block_stop = block.stop if block.stop >= 0 else None  # negative step down to the first frame
+            yield (times, self.read_frames(block.start, block_stop, block.step, varID_list))
+
+    def _iter_stream(self, pos_vars):
+        """
+        @brief: read the next frames of a non-seekable file (streaming mode) until its end
+        The time serie (and nb_frame) is completed while frames are read
+        @param pos_vars <int list>: positions of the target variables in the frame
+        @return <generator>: (frame position, time, numpy 2D-array with shape (nb target var, nb node))
+        """
+        try:
+            while True:
+                data = self.file.read(self.frameSize)
+                if len(data) < self.frameSize:
+                    if len(data) > 0:
+                        log("WARNING: incomplete last frame ({} bytes) is ignored".format(len(data)))
+                    return
+                values = np.frombuffer(data, dtype='>f4')
+                time = float(values[1])
+                self._time.append(time)
+                self.nb_frame += 1
+                var = values[3:].reshape(self._nbvar, self.nnode + 2)[pos_vars, 1:-1]
+                yield (self.nb_frame - 1, time, var.astype(self.dtype))
+        finally:
+            self._build_time_index()
+
+    def _iter_stream_blocks(self, varID_list, start, stop, step, nb_frame_per_block):
+        """
+        @brief: iterate over blocks of frames read sequentially (streaming mode, @see iter_frame_blocks)
+        """
+        if varID_list is None:
+            varID_list = self.varID
+        if start < 0 or (stop is not None and stop < 0) or step < 1:
+            raise ValueError("only positive positions and steps are possible in streaming mode")
+        times, block = [], []
+        for pos, time, values in self._iter_stream(self._pos_vars(varID_list)):
+            if stop is not None and pos >= stop:
+                break
+            if pos >= start and (pos - start) % step == 0:
+                times.append(time)
+                block.append(values)
+                if len(times) == nb_frame_per_block:
+                    yield (times, np.stack(block))
+                    times, block = [], []
+        if times:
+            yield (times, np.stack(block))
+
+    def compute_stats(self, save=None, block_size=BLOCK_SIZE):
+        """
+        @brief: compute statistics of every variable in every frame (single pass over the file)
+        Attribute assigned: stats, dict of numpy 2D-arrays with shape (nb frame, nb var) for keys:
+          'min' and 'max' (NaN if the frame has a NaN value, as numpy min/max), 'mean' (of non-NaN values)
+          and 'nan' (number of NaN values)
+        @param save <bool>: write the statistics index (filename + STATS_EXT):
+          * None: only if it already exists (outdated index)
+          * True: always
+          * False: never
+        @param block_size <int>: memory budget (in bytes) of the data read at once
+        """
+        # Statistics are gathered by block (the number of frames is only known at the end in streaming mode)
+        blocks = {key: [np.empty([0, self._nbvar])] for key in STATS}
+        for times, block in self.iter_frame_blocks(block_size=block_size):
+            nan = np.isnan(block).sum(axis=2)
+            blocks['min'].append(np.minimum.reduce(block, axis=2))
+            blocks['max'].append(np.maximum.reduce(block, axis=2))
+            blocks['nan'].append(nan)
+            with np.errstate(invalid='ignore'):  # NaN mean if all values are NaN
+                blocks['mean'].append(np.nansum(block, axis=2, dtype='float64') / (self.nnode - nan))
+        dtypes = {'min': FLOAT_TYPE, 'max': FLOAT_TYPE, 'mean': 'float64', 'nan': 'int64'}
+        self.stats = {key: np.concatenate(blocks[key]).astype(dtypes[key]) for key in STATS}
+
+        if self._stat is not None and (save or (save is None and os.path.exists(self.statsName))):
+            self._write_stats()
+
+    def load_stats(self):
+        """
+        @brief: assign stats (@see compute_stats) from the statistics index
+        @return <bool>: False if the statistics index is missing, unreadable or outdated
+        """
+        if self._stat is None:
+            return False  # no statistics index for a file object
+        try:
+            with np.load(self.statsName) as index:
+                if int(index['version']) != STATS_VERSION or int(index['file_size']) != self._stat.st_size \
+                        or int(index['file_mtime']) != self._stat.st_mtime_ns:
+                    return False
+                stats = {key: index[key] for key in STATS}
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return False
+        if stats['min'].shape != (self.nb_frame, self._nbvar):
+            return False
+        self.stats = stats
+        log("Statistics loaded from {}".format(self.statsName))
+        return True
+
+    def _write_stats(self):
+        """
+        @brief: write the statistics index (with the validity stamp of the Serafin file)
+        A failure (e.g. read-only folder) is not an error: statistics are computed again at next use
+        """
+        tmp_name = self.statsName + '.tmp'
+        try:
+            with open(tmp_name, 'wb') as fileout:
+                np.savez(fileout, version=STATS_VERSION,
+                         file_size=self._stat.st_size, file_mtime=self._stat.st_mtime_ns, **self.stats)
+            os.replace(tmp_name, self.statsName)
+            log("Write statistics index {}".format(self.statsName))
+        except OSError as error:
+            log("WARNING: statistics index could not be written ({})".format(error))
+
+    def get_stats(self, save=None):
+        """
+        @brief: statistics of every variable in every frame, from the statistics index if it is valid
+        @param save <bool>: write the statistics index if they are computed (@see compute_stats)
+        @return <dict>: numpy 2D-arrays with shape (nb frame, nb var) for keys of STATS
+        """
+        if self.stats is None or len(self.stats['min']) != self.nb_frame:
+            if not self.load_stats():
+                self.compute_stats(save)
+        return self.stats
+
+    def find_frames(self, varID, stat='max', above=None, below=None):
+        """
+        @brief: positions of frames whose statistic of a variable is in a range
+        Frame values are not read if the statistics index is valid (e.g. frames where max(M) > 2: find_frames('M', 'max', above=2))
+        @param varID <str>: variable ID
+        @param stat <str>: statistic among STATS
+        @param above <float>: the statistic has to be strictly greater than this value (ignored if None)
+        @param below <float>: the statistic has to be strictly lower than this value (ignored if None)
+        @return <int list>: frame positions
+        """
+        values = self.get_stats()[stat][:, self._pos_vars([varID])[0]]
+        selection = np.ones(len(values), dtype=bool)
+        if above is not None:
+            selection &= values > above
+        if below is not None:
+            selection &= values < below
+        return np.nonzero(selection)[0].tolist()
 
 
 class Write(Serafin):
     """Read Serafin binary file"""
 
-    def __init__(self, filename, overwrite=False):
+    def __init__(self, filename, overwrite=False, dtype=FLOAT_TYPE, queue_size=0):
+        """
+        @param dtype <str>: type of the in-memory values (FLOAT_TYPE by default)
+        @param queue_size <int>: maximum number of packed buffers waiting for a background writer thread
+          (0 to write in the calling thread). Frames are packed (copied) by the caller, which waits only if
+          the queue is full. Write errors are raised at the next write or at closing.
+        """
         if overwrite: mode = 'wb'
         else: mode = 'xb'
-        Serafin.__init__(self, filename, mode)
+        Serafin.__init__(self, filename, mode, dtype)
         self.time = []
-        print(mode)
+        self.headerSize = None  # known once the file is preallocated
+        self.queue_size = queue_size
+        self._writer = None
+        self._writer_error = None
+        if self._fileobj is sys.stdout.buffer:
+            common_data.log_file = sys.stderr  # standard output is kept for Serafin data
+        log(mode)
 
     def __enter__(self):
         try:
-            return Serafin.__enter__(self)
+            Serafin.__enter__(self)
         except FileExistsError:
             sys.exit("File {} already exists (remove the file or change the option and then re-run the program)".format(self.fileName))
+        if self.queue_size > 0:
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._writer = threading.Thread(target=self._write_from_queue, daemon=True)
+            self._writer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop_writer()
+        Serafin.__exit__(self, exc_type, exc_val, exc_tb)
+        if self._writer_error is not None and exc_type is None:
+            raise self._writer_error
+        return False
+
+    def _stop_writer(self):
+        """
+        @brief: stop the background writer thread (if any) once the queued buffers are written
+        """
+        if self._writer is not None:
+            self._queue.put(None)  # end of writing (after the queued buffers)
+            self._writer.join()
+            self._writer = None
+
+    def _write(self, data):
+        """
+        @brief: write data in the file, or queue them for the background writer thread
+        @param data <bytes-like object>: data to write (not modified afterwards)
+        """
+        if self._writer is None:
+            self.file.write(data)
+        else:
+            if self._writer_error is not None:
+                raise self._writer_error
+            self._queue.put(data)  # wait for a free place if the queue is full
+
+    def _write_from_queue(self):
+        """
+        @brief: write queued data in order (background writer thread)
+        After an error, the queue is still emptied so that the calling thread is never blocked
+        """
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            if self._writer_error is None:
+                try:
+                    self.file.write(data)
+                except Exception as error:
+                    self._writer_error = error
 
     def copy_header(self, other):
         """
@@ -620,9 +1427,9 @@ class Write(Serafin):
         self.title = other.title
 
         self.type = other.type
-        self.varID = other.varID
-        self.varNames = other.varNames
-        self.varUnits = other.varUnits
+        self.varID = list(other.varID)  # copies: variables of the output can be modified (e.g. removeVarIDs)
+        self.varNames = list(other.varNames)
+        self.varUnits = list(other.varUnits)
         self._nbvar = other._nbvar
         self._nbvar2 = other._nbvar2
 
@@ -636,8 +1443,8 @@ class Write(Serafin):
         self.ndp = other.ndp
         self._var_i = other._var_i
 
-        self.ikle = other.ikle
-        self.ipobo = other.ipobo
+        self.ikle = np.asarray(other.ikle, dtype=INT_TYPE)
+        self.ipobo = np.asarray(other.ipobo, dtype=INT_TYPE)
         self.x = other.x
         self.y = other.y
 
@@ -671,88 +1478,261 @@ class Write(Serafin):
             raise ValueError("No variables to export")
         self.assignVarIDs(self.varID)
 
+    def _write_record(self, data):
+        """
+        @brief: write a Fortran record (with its markers) with a single call
+        @param data <bytes or numpy array>: content of the record (a numpy array is written as big-endian 4-byte values)
+        """
+        if isinstance(data, np.ndarray):
+            data = data.astype('>f4' if data.dtype.kind == 'f' else '>i4').tobytes()
+        marker = struct.pack('>i', len(data))
+        self._write(marker + data + marker)
+
     def write_header(self):
         """Write Serafin header from attributes"""
         # Title
-        self.file.write(struct.pack('>i', 80))
-        self.file.write(self.title)
-        self.file.write(struct.pack('>i', 80))
+        self._write_record(self.title)
 
         # _nbvar and _nbvar2
-        self.file.write(struct.pack('>i', 2 * 4))
-        self.file.write(struct.pack('>i', self._nbvar))
-        self.file.write(struct.pack('>i', self._nbvar2))
-        self.file.write(struct.pack('>i', 2 * 4))
+        self._write_record(np.array([self._nbvar, self._nbvar2]))
 
         # Variable name
         for j in range(self._nbvar):
-            self.file.write(struct.pack('>i', 2 * 16))
-            self.file.write(self.varNames[j].ljust(16))
-            self.file.write(self.varUnits[j].ljust(16))
-            self.file.write(struct.pack('>i', 2 * 16))
+            self._write_record(self.varNames[j].ljust(16) + self.varUnits[j].ljust(16))
 
         # Date
-        self.file.write(struct.pack('>i', 10 * 4))
-        self.file.write(struct.pack('>10i', *self._param))
-        self.file.write(struct.pack('>i', 10 * 4))
+        self._write_record(np.array(self._param))
         if self._param[-1] == 1:
-            self.file.write(struct.pack('>i', 6 * 4))
-            self.file.write(struct.pack('>6i', *self.date))
-            self.file.write(struct.pack('>i', 6 * 4))
+            self._write_record(np.array(self.date))
 
         # nelem, nnode, nplan and _var_i
-        self.file.write(struct.pack('>i', 4 * 4))
-        self.file.write(struct.pack('>i', self.nelem))
-        self.file.write(struct.pack('>i', self.nnode))
-        self.file.write(struct.pack('>i', self.ndp))
-        self.file.write(struct.pack('>i', self._var_i))
-        self.file.write(struct.pack('>i', 4 * 4))
+        self._write_record(np.array([self.nelem, self.nnode, self.ndp, self._var_i]))
 
-        # IKLE
-        self.file.write(struct.pack('>i', 4 * self.nelem * self.ndp))
-        nb_val = '>%ii' % (self.nelem * self.ndp)
-        self.file.write(struct.pack(nb_val, *self.ikle))
-        self.file.write(struct.pack('>i', 4 * self.nelem * self.ndp))
-
-        # IPOBO
-        self.file.write(struct.pack('>i', 4 * self.nnode))
-        nb_val = '>%ii' % (self.nnode)
-        self.file.write(struct.pack(nb_val, *self.ipobo))
-        self.file.write(struct.pack('>i', 4 * self.nnode))
+        # IKLE and IPOBO
+        self._write_record(np.asarray(self.ikle, dtype=INT_TYPE))
+        self._write_record(np.asarray(self.ipobo, dtype=INT_TYPE))
 
-        # X coordinates
-        self.file.write(struct.pack('>i', 4 * self.nnode))
-        nb_val = '>%if' % (self.nnode)
-        self.file.write(struct.pack(nb_val, *self.x))
-        self.file.write(struct.pack('>i', 4 * self.nnode))
-
-        # Y coordinates
-        self.file.write(struct.pack('>i', 4 * self.nnode))
-        nb_val = '>%if' % (self.nnode)
-        self.file.write(struct.pack(nb_val, *self.y))
-        self.file.write(struct.pack('>i', 4 * self.nnode))
+        # X and Y coordinates
+        self._write_record(np.asarray(self.x, dtype=FLOAT_TYPE))
+        self._write_record(np.asarray(self.y, dtype=FLOAT_TYPE))
 
+    def _pack_frames(self, times, values):
+        """
+        @brief: pack frames in a big-endian buffer (@see _pack_frames)
+        """
+        return _pack_frames(times, values, self._nbvar, self.nnode)
 
     def write_entire_frame(self, time, values):
         """
         @brief: write all variables/nodes values
+        The frame (with its record markers) is packed in a single buffer and written with a single call
         @param time <float>: time in second
         @param values <numpy 2D-array>: values to write
         """
-        nb_val = '>%if' % (self.nnode)
-        self.file.write(struct.pack('>i', 4))
-        self.file.write(struct.pack('>f', time))
-        self.file.write(struct.pack('>i', 4))
-        for i in range(self._nbvar):
-            self.file.write(struct.pack('>i', 4 * self.nnode))
-            self.file.write(struct.pack(nb_val, *values[i]))
-            self.file.write(struct.pack('>i', 4 * self.nnode))
+        values = np.asarray(values, dtype=self.dtype)
+        self._write(self._pack_frames([time], values[np.newaxis]).data)
+
+    def write_frames(self, times, values, buffer_size=WRITE_BUFFER_SIZE):
+        """
+        @brief: write a block of frames
+        Consecutive frames are packed in buffers of about buffer_size bytes, each one written with a single call
+        @param times <float list>: time (in seconds) of each frame
+        @param values <numpy 3D-array>: shape = (nb frame, nb var, nb node)
+        @param buffer_size <int>: size (in bytes) of the buffers (at least one frame)
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        if len(times) != len(values):
+            raise ValueError("{} times for {} frames".format(len(times), len(values)))
+        nb_frame_per_buffer = max(1, buffer_size // (4 * (3 + self._nbvar * (self.nnode + 2))))
+        for i in range(0, len(times), nb_frame_per_buffer):
+            self._write(self._pack_frames(times[i:i + nb_frame_per_buffer], values[i:i + nb_frame_per_buffer]).data)
+
+    def preallocate(self, nb_frame):
+        """
+        @brief: reserve the space of all the frames after the header (the file gets its final size)
+        Frames have a fixed size, so each one can then be written at its position by any process (@see frame_writer)
+        @param nb_frame <int>: number of frames of the file
+        """
+        if self._fileobj is not None:
+            raise io.UnsupportedOperation("only a file opened with a path can be preallocated")
+        self._stop_writer()  # frames are no longer written in order
+        if self._writer_error is not None:
+            raise self._writer_error
+        self.file.flush()
+        self.headerSize = self.file.tell()
+        self.frameSize = 4 * (3 + self._nbvar * (self.nnode + 2))
+        self.nb_frame = nb_frame
+        length = nb_frame * self.frameSize
+        try:
+            if length > 0:
+                os.posix_fallocate(self.file.fileno(), self.headerSize, length)
+        except (AttributeError, OSError) as error:
+            # Not available on this system or not supported by the file system (other errors, e.g. no space
+            # left on device, are raised here rather than by the worker processes)
+            if isinstance(error, OSError) and error.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                raise
+            os.ftruncate(self.file.fileno(), self.headerSize + length)  # no reservation of disk blocks (sparse file)
+        log("Preallocate {} frames ({} bytes)".format(nb_frame, length))
+
+    def frame_writer(self):
+        """
+        @brief: writer of frames at their positions in the preallocated file (to be sent to worker processes)
+        @return <FrameWriter>
+        """
+        if self.headerSize is None:
+            raise ValueError("file {} has to be preallocated".format(self.fileName))
+        return FrameWriter(self.fileName, self.headerSize, self._nbvar, self.nnode, self.nb_frame, self.dtype)
+
+    def copy_frames(self, resin, pos_list=None):
+        """
+        @brief: copy frames of a Serafin file without decoding their values (byte-level copy)
+        Variables of the output (varID) are taken from the input file: whole frames are copied if they
+        are identical (and in the same order), otherwise the time record and the variable records
+        (contiguous ones at once) are copied for each frame
+        @param resin <Serafin.Read>: input file with the same mesh
+        @param pos_list <int list>: frame positions (0-indexed, negative values count from the end), all frames if None
+        """
+        if self.nnode != resin.nnode:
+            raise ValueError("{} has {} nodes ({} expected)".format(resin.fileName, resin.nnode, self.nnode))
+        if pos_list is None:
+            pos_list = range(resin.nb_frame)
+        if isinstance(resin, MultiRead):
+            for i, local_pos_list in resin._split_positions(pos_list):
+                self.copy_frames(resin._open(i), local_pos_list)
+            return
+        if not resin.raw_frames or resin.streaming:
+            self._copy_frames_values(resin, pos_list)
+            return
+
+        pos_vars = resin._pos_vars(self.varID)
+        record_size = 8 + 4 * self.nnode
+        if pos_vars == list(range(resin._nbvar)):
+            # Consecutive frames are copied at once
+            offsets = [resin._frame_offset(pos) - 12 for pos in pos_list]
+            start = 0
+            for i in range(1, len(offsets) + 1):
+                if i == len(offsets) or offsets[i] != offsets[i - 1] + resin.frameSize:
+                    self._copy_bytes(resin.file, offsets[start], (i - start) * resin.frameSize)
+                    start = i
+        else:
+            # Runs of consecutive variables (in the input file)
+            runs = []
+            for pos_var in pos_vars:
+                if runs and pos_var == runs[-1][0] + runs[-1][1]:
+                    runs[-1][1] += 1
+                else:
+                    runs.append([pos_var, 1])
+            for pos in pos_list:
+                offset = resin._frame_offset(pos)
+                self._copy_bytes(resin.file, offset - 12, 12)  # time record
+                for first, nb_var in runs:
+                    self._copy_bytes(resin.file, offset + first * record_size, nb_var * record_size)
+
+    def _copy_frames_values(self, resin, pos_list):
+        """
+        @brief: copy frames by decoding and encoding their values (when a byte-level copy is not possible)
+        """
+        for time, values in resin.iter_frames(self.varID, pos_list):
+            self.write_entire_frame(time, values)
+
+    def _copy_bytes(self, src, offset, length):
+        """
+        @brief: copy bytes of a file at the current position of the output file
+        The copy is done by the kernel (os.copy_file_range or os.sendfile) if possible, with buffers otherwise
+        @param src <file object>: input file
+        @param offset <int>: position (in bytes) of the data in the input file
+        @param length <int>: number of bytes to copy
+        """
+        copied = 0
+        if self._writer is None:  # queued data have to be written before
+            try:
+                in_fd, out_fd = src.fileno(), self.file.fileno()
+            except (AttributeError, OSError):
+                in_fd = None
+            if in_fd is not None:
+                self.file.flush()
+                copied = _kernel_copy(in_fd, out_fd, offset, length)
+                if copied > 0 and self.file.seekable():
+                    self.file.seek(0, 2)  # update position of the file object (written sequentially)
+        src.seek(offset + copied, 0)
+        while copied < length:
+            data = src.read(min(WRITE_BUFFER_SIZE, length - copied))
+            if not data:
+                raise EOFError("{} is truncated".format(src.name))
+            self._write(data)
+            copied += len(data)
+
+
+def _pack_frames(times, values, nbvar, nnode):
+    """
+    @brief: pack frames (time records, variable records and their markers) in a big-endian buffer
+    @param times <float list>: time (in seconds) of each frame
+    @param values <numpy 3D-array>: shape = (nb frame, nb var, nb node)
+    @param nbvar <int>: number of variables written in a frame
+    @param nnode <int>: number of nodes
+    @return <numpy 2D-array>: shape = (nb frame, nb 4-byte values in a frame)
+    """
+    frames = np.empty([len(times), 3 + nbvar * (nnode + 2)], dtype='>f4')
+    frames.view('>i4')[:, [0, 2]] = 4
+    frames[:, 1] = times
+    var = frames[:, 3:].reshape(len(times), nbvar, nnode + 2)
+    var.view('>i4')[:, :, [0, -1]] = 4 * nnode
+    var[:, :, 1:-1] = values[:, :nbvar]
+    return frames
+
+
+class FrameWriter:
+    """Write frames at their positions in a preallocated Serafin file (@see Write.preallocate)"""
+
+    def __init__(self, filename, headerSize, nbvar, nnode, nb_frame, dtype=FLOAT_TYPE):
+        """
+        A FrameWriter can be sent to worker processes: each one opens its own handle of the file
+        @param headerSize <int>: size (in bytes) of the header
+        @param nbvar <int>: number of variables in a frame
+        @param nnode <int>: number of nodes
+        @param nb_frame <int>: number of preallocated frames
+        """
+        self.fileName = filename
+        self.headerSize = headerSize
+        self._nbvar = nbvar
+        self.nnode = nnode
+        self.nb_frame = nb_frame
+        self.dtype = np.dtype(dtype)
+        self.frameSize = 4 * (3 + nbvar * (nnode + 2))
+        self._file = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_file'] = None  # a file handle is not shared between processes
+        return state
+
+    def write_entire_frame(self, pos, time, values):
+        """
+        @brief: write all variables/nodes values of a frame at its position (other frames are not modified)
+        @param pos <int>: frame position (0-indexed)
+        @param time <float>: time in second
+        @param values <numpy 2D-array>: values to write
+        """
+        if not 0 <= pos < self.nb_frame:
+            raise IndexError("frame position {} is not in range [0, {}[".format(pos, self.nb_frame))
+        if self._file is None:
+            self._file = open(self.fileName, 'r+b')
+        values = np.asarray(values, dtype=self.dtype)
+        self._file.seek(self.headerSize + pos * self.frameSize, 0)
+        self._file.write(_pack_frames([time], values[np.newaxis], self._nbvar, self.nnode).data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
 
 def interpolate_from_ponderations(var, ponderations, points, varID_list, add_columns=None, digits=None):
     """
     ...
     """
+    import pandas as pd
+
     values = pd.DataFrame(points)
 
     # Add columns
@@ -778,6 +1758,489 @@ def interpolate_from_ponderations(var, ponderations, points, varID_list, add_col
 
     return values
 
+
+class MultiRead(Read):
+    """Read successive Serafin files on the same mesh (e.g. restarts of a simulation) as a single file"""
+
+    # Header attributes taken from the first file
+    HEADER_ATTRIBUTES = ['title', '_nbvar', '_nbvar2', 'varNames', 'varUnits', '_param', 'nplan', 'nelem', 'nnode',
+                         'ndp', '_var_i', 'ikle', 'ipobo', 'x', 'y', 'nnode2d', 'headerSize', 'frameSize', 'type',
+                         'varID', 'ikle2d']
+
+    def __init__(self, filename, dtype=FLOAT_TYPE, sidecar=None, overlap='last', max_open=MAX_OPEN_FILES):
+        """
+        @param filename <str or str list>: list file (MULTI_EXT) or list of Serafin filenames, in the order of the simulation
+        @param dtype <str>: type of the returned variable values (FLOAT_TYPE by default)
+        @param sidecar <bool>: use of the sidecar index of each file (@see Read)
+        @param overlap <str>: policy among OVERLAP_POLICIES for overlapping times (@see merge_time_series)
+        @param max_open <int>: maximum number of files opened at the same time (least recently used ones are closed)
+        """
+        if isinstance(filename, (str, os.PathLike)):
+            filename = os.fspath(filename)
+            with open(filename, 'r') as filein:
+                folder = os.path.dirname(filename)
+                filenames = [os.path.join(folder, line.strip()) for line in filein
+                             if line.strip() and not line.startswith('#')]
+            name = filename
+        else:
+            filenames = list(filename)
+            name = ' + '.join(filenames)
+        if not filenames:
+            raise ValueError("no Serafin file in {}".format(name))
+        Serafin.__init__(self, name, 'rb', dtype)
+        self._stat = None  # no statistics index
+        self.fileSize = None
+        self.streaming = False
+        self.sidecar = sidecar
+        self._sidecar_loaded = False
+        self._time = None
+        self.statsName = self.fileName + STATS_EXT
+        self.stats = None
+
+        self.overlap = overlap
+        self.max_open = max(1, max_open)
+        self.readers = [Read(name, dtype, sidecar) for name in filenames]
+        self._opened = {}  # opened readers (index -> Read), in the order of their last use
+        self._frames = []  # (reader index, position in the file) of each frame
+
+    def __enter__(self):
+        log(">>> Open {} Serafin files".format(len(self.readers)))
+        self.file = None  # files are opened when they are read
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for reader in self._opened.values():
+            reader.__exit__(exc_type, exc_val, exc_tb)
+        self._opened = {}
+        log("<<< Close {} Serafin files".format(len(self.readers)))
+        return False
+
+    def _open(self, i):
+        """
+        @brief: opened reader of a file (the least recently used file is closed if max_open files are opened)
+        @param i <int>: index of the file
+        @return <Read>: reader with its header read
+        """
+        reader = self._opened.pop(i, None)
+        if reader is None:
+            if len(self._opened) >= self.max_open:
+                lru = next(iter(self._opened))
+                self._opened.pop(lru).__exit__(None, None, None)
+            reader = self.readers[i].__enter__()
+        self._opened[i] = reader
+        return reader
+
+    def readHeader(self):
+        """
+        @brief: read header and time serie of every file and merge their time series
+        All the files must have exactly the same mesh and the same variables
+        """
+        time_lists = []
+        for i, reader in enumerate(self.readers):
+            reader = self._open(i)
+            reader.readHeader()
+            reader.get_time()
+            if i == 0:
+                for attr in MultiRead.HEADER_ATTRIBUTES:
+                    setattr(self, attr, getattr(reader, attr))
+                if self._param[-1] == 1:
+                    self.date = reader.date
+            elif not reader.identicalMesh(self):
+                sys.exit("ERROR: mesh of {} is different from the mesh of {}".format(reader.fileName, self.readers[0].fileName))
+            elif reader.varID != self.varID:
+                sys.exit("ERROR: variables of {} are different from the ones of {}".format(reader.fileName, self.readers[0].fileName))
+            time_lists.append(reader.time)
+
+        try:
+            pos_lists = merge_time_series(time_lists, self.overlap)
+        except ValueError as error:
+            sys.exit("ERROR: {}".format(error))
+        self._frames = [(i, pos) for i, pos_list in enumerate(pos_lists) for pos in pos_list]
+        self._time = [time_lists[i][pos] for i, pos in self._frames]
+        self.nb_frame = len(self._frames)
+        self._build_time_index()
+
+        log("{} result (with {} plans) in {} files ({} frames)".format(self.type, self.nplan, len(self.readers), self.nb_frame))
+
+    def get_time(self):
+        """
+        @brief: nothing to read, the time series of the files are already merged by readHeader
+        """
+        if self._time is None:
+            raise ValueError("the headers of {} have to be read before the time serie".format(self.fileName))
+
+    def _memmap_frames(self):
+        raise io.UnsupportedOperation("frames of several files can not be mapped in memory")
+
+    def _frame_offset(self, pos):
+        raise io.UnsupportedOperation("frames of several files have no position in a single file")
+
+    def refresh(self):
+        raise io.UnsupportedOperation("files of a multi-file result can not be refreshed")
+
+    def _locate(self, pos):
+        """
+        @brief: file index and position in the file of a frame
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        """
+        if pos < 0:
+            pos += self.nb_frame
+        if not 0 <= pos < self.nb_frame:
+            raise IndexError("frame position {} is not in range [0, {}[".format(pos, self.nb_frame))
+        return self._frames[pos]
+
+    def _split_positions(self, pos_list):
+        """
+        @brief: split frame positions into runs of consecutive frames of the same file
+        @param pos_list <int list>: frame positions
+        @return <list>: (file index, positions in the file) for each run
+        """
+        runs = []
+        for pos in pos_list:
+            i, local_pos = self._locate(pos)
+            if runs and runs[-1][0] == i:
+                runs[-1][1].append(local_pos)
+            else:
+                runs.append((i, [local_pos]))
+        return runs
+
+    def _read_frame_values(self, pos, pos_vars, file=None):
+        """
+        @brief: read variables of a frame in its file
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        @param pos_vars <int list>: positions of the target variables in the frame
+        @param file: unused (the file of the frame is opened by the pool)
+        @return var <numpy 2D-array>: shape = (nb target var, nb node)
+        """
+        i, local_pos = self._locate(pos)
+        return self._open(i)._read_frame_values(local_pos, pos_vars)
+
+    def read_frames(self, start=0, stop=None, step=1, varID_list=None):
+        """
+        @brief: read a block of frames (frames of a file with a constant step are read with Read.read_frames)
+        @param start, stop, step <int>: frame positions, same meaning as for a slice
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @return var <numpy 3D-array>: shape = (nb frame, nb target var, nb node)
+        """
+        if varID_list is None:
+            varID_list = self.varID
+        pos_vars = self._pos_vars(varID_list)
+        blocks = [np.empty([0, len(pos_vars), self.nnode], dtype=self.dtype)]
+        for i, local_pos_list in self._split_positions(range(self.nb_frame)[start:stop:step]):
+            reader = self._open(i)
+            steps = np.diff(local_pos_list)
+            if len(steps) > 0 and steps[0] > 0 and np.all(steps == steps[0]):
+                blocks.append(reader.read_frames(local_pos_list[0], local_pos_list[-1] + 1, int(steps[0]), varID_list))
+            else:
+                blocks += [reader._read_frame_values(pos, pos_vars)[np.newaxis] for pos in local_pos_list]
+        return np.concatenate(blocks)
+
+    def iter_frames(self, varID_list=None, pos_list=None, prefetch=PREFETCH):
+        """
+        @brief: iterate over frames (@see Read.iter_frames), successively in each file
+        """
+        if pos_list is None:
+            pos_list = range(self.nb_frame)
+        for i, local_pos_list in self._split_positions(pos_list):
+            yield from self._open(i).iter_frames(varID_list, local_pos_list, prefetch)
+
+    def read_nodes(self, nodes, varID_list=None, pos_list=None, max_gap=NODE_GAP):
+        """
+        @brief: read time series of variables at a subset of nodes (@see Read.read_nodes), successively in each file
+        @return var <numpy 3D-array>: shape = (nb frame, nb target var, nb target node)
+        """
+        if varID_list is None:
+            varID_list = self.varID
+        if pos_list is None:
+            pos_list = range(self.nb_frame)
+        blocks = [np.empty([0, len(varID_list), len(nodes)], dtype=self.dtype)]
+        for i, local_pos_list in self._split_positions(pos_list):
+            blocks.append(self._open(i).read_nodes(nodes, varID_list, local_pos_list, max_gap))
+        return np.concatenate(blocks)
+
+
+class Patch(Read):
+    """Modify values of an existing Serafin file in place (frames have a fixed layout)"""
+
+    def __init__(self, filename, dtype=FLOAT_TYPE, snapshot=False):
+        """
+        @param dtype <str>: type of the returned variable values (FLOAT_TYPE by default)
+        @param snapshot <bool>: save the bytes which are overwritten (copy-on-write) in a snapshot file
+          (filename + SNAPSHOT_EXT) to restore the file with restore_snapshot. The snapshot of successive
+          modifications is accumulated (the file is restored in its state before the first one)
+        """
+        Read.__init__(self, filename, dtype)
+        self.mode = 'r+b'
+        self.snapshot = snapshot
+        self.snapshotName = self.fileName + SNAPSHOT_EXT
+        self._snapshot_file = None
+
+    def __enter__(self):
+        Read.__enter__(self)
+        if self.snapshot:
+            self._snapshot_file = open(self.snapshotName, 'ab')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._snapshot_file is not None:
+            self._snapshot_file.close()
+            self._snapshot_file = None
+        return Read.__exit__(self, exc_type, exc_val, exc_tb)
+
+    def _overwrite(self, offset, data):
+        """
+        @brief: overwrite bytes of the file (the previous ones are saved in the snapshot file before)
+        @param offset <int>: position (in bytes) in the file
+        @param data <bytes>: new bytes
+        """
+        if self._snapshot_file is not None:
+            self.file.seek(offset, 0)
+            self._snapshot_file.write(SNAPSHOT_RECORD.pack(offset, len(data)) + self.file.read(len(data)))
+            self._snapshot_file.flush()
+        self.file.seek(offset, 0)
+        self.file.write(data)
+
+    def write_var_in_frame_at_pos(self, pos, varID, values):
+        """
+        @brief: overwrite all the values of a single variable in a frame
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        @param varID <str>: variable ID
+        @param values <numpy 1D-array>: new values (size = nb node)
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        if values.shape != (self.nnode,):
+            raise ValueError("{} values for {} nodes".format(values.size, self.nnode))
+        self._overwrite(self._var_offset(pos, self._pos_vars([varID])[0]), values.astype('>f4').tobytes())
+
+    def write_nodes_in_frame_at_pos(self, pos, varID, nodes, values, max_gap=NODE_GAP):
+        """
+        @brief: overwrite values of a single variable at a subset of nodes in a frame
+        Neighbouring nodes (separated by less than max_gap nodes) are written with a single call
+        (values between them are read and written back)
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        @param varID <str>: variable ID
+        @param nodes <int list>: node numbers (1-indexed)
+        @param values <numpy 1D-array>: new values (same size as nodes, or a single value)
+        @param max_gap <int>: maximum number of unchanged nodes rewritten to join two target nodes
+        """
+        offset = self._var_offset(pos, self._pos_vars([varID])[0])
+        index = np.asarray(nodes, dtype=int) - 1
+        if len(index) > 0 and (index.min() < 0 or index.max() >= self.nnode):
+            raise IndexError("node numbers should be in range [1, {}]".format(self.nnode))
+        values = np.broadcast_to(np.asarray(values, dtype=self.dtype), index.shape)
+        order = np.argsort(index, kind='stable')  # the last value of a duplicated node is kept
+        index, values = index[order], values[order]
+
+        for run in np.split(np.arange(len(index)), np.where(np.diff(index) > max_gap)[0] + 1):
+            if len(run) == 0:
+                continue
+            first = index[run[0]]
+            if np.all(np.diff(index[run]) == 1):
+                data = values[run].astype('>f4')
+            else:
+                self.file.seek(offset + 4 * first, 0)
+                data = self._read_values(index[run[-1]] - first + 1, '>f4').copy()
+                data[index[run] - first] = values[run]
+            self._overwrite(offset + 4 * first, data.tobytes())
+
+
+def restore_snapshot(filename):
+    """
+    @brief: restore a Serafin file modified by Patch from its snapshot file (which is then removed)
+    @param filename <str>: Serafin filename
+    """
+    snapshot_name = filename + SNAPSHOT_EXT
+    with open(snapshot_name, 'rb') as snapshot:
+        data = snapshot.read()
+    records = []
+    i = 0
+    while i + SNAPSHOT_RECORD.size <= len(data):
+        offset, length = SNAPSHOT_RECORD.unpack_from(data, i)
+        i += SNAPSHOT_RECORD.size
+        if i + length > len(data):
+            break  # incomplete record (the data were not overwritten)
+        records.append((offset, data[i:i + length]))
+        i += length
+    with open(filename, 'r+b') as file:
+        for offset, old_data in reversed(records):
+            file.seek(offset, 0)
+            file.write(old_data)
+    os.remove(snapshot_name)
+    log("{} restored from {} ({} modifications)".format(filename, snapshot_name, len(records)))
+
+
+def merge_time_series(time_lists, overlap='last'):
+    """
+    @brief: merge the time series of successive files (e.g. restarts of a simulation) in a single time axis
+    Frames whose time is not strictly after the previous kept frame (overlaps and duplicates) are dropped,
+    according to the overlap policy: with 'first' the frames of the earlier file are kept, with 'last'
+    the frames of the later file supersede them (a file is then cut before the first time of the next ones)
+    @param time_lists <list of float list>: time serie of each file (in the order of the files)
+    @param overlap <str>: policy among OVERLAP_POLICIES
+    @return <list of int list>: positions of the kept frames in each file
+    """
+    if overlap not in OVERLAP_POLICIES:
+        raise ValueError("Unknown overlap policy {} (possible policies are {})".format(overlap, OVERLAP_POLICIES))
+    pos_lists = []
+    if overlap == 'last':
+        next_time = float('inf')
+        for times in reversed(time_lists):
+            pos_list = []
+            for pos in reversed(range(len(times))):
+                if times[pos] < next_time:
+                    pos_list.append(pos)
+                    next_time = times[pos]
+            pos_lists.append(pos_list[::-1])
+        return pos_lists[::-1]
+
+    last_time = -float('inf')
+    for i, times in enumerate(time_lists):
+        pos_list = []
+        for pos, time in enumerate(times):
+            if time > last_time:
+                pos_list.append(pos)
+                last_time = time
+            elif overlap == 'error':
+                raise ValueError("time {} of file n°{} is not after the previous time {}".format(time, i + 1, last_time))
+        pos_lists.append(pos_list)
+    return pos_lists
+
+
+def _kernel_copy(in_fd, out_fd, offset, length):
+    """
+    @brief: copy bytes between two files without user space buffers (os.copy_file_range or os.sendfile)
+    The output is written at its current position
+    @return <int>: number of copied bytes (0 if the kernel copy is not supported)
+    """
+    copied = 0
+    for copy in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, copy):
+            continue
+        try:
+            while copied < length:
+                if copy == 'copy_file_range':
+                    nb_bytes = os.copy_file_range(in_fd, out_fd, length - copied, offset + copied)
+                else:
+                    nb_bytes = os.sendfile(out_fd, in_fd, offset + copied, length - copied)
+                if nb_bytes == 0:
+                    break
+                copied += nb_bytes
+        except OSError:
+            pass  # not supported (e.g. file systems or operating system), try next method
+        if copied == length:
+            break
+    return copied
+
+
+def _read_nodes_in_file(filename, nodes, varID_list, time_list, mesh_type):
+    """
+    @brief: read time series at nodes in a single file (task of read_nodes_in_files)
+    """
+    with Read(filename) as resin:
+        resin.readHeader()
+        if mesh_type is not None and resin.type != mesh_type:
+            raise ValueError("{} is a {} result ({} expected)".format(filename, resin.type, mesh_type))
+        resin.get_time()
+        if time_list is None:
+            pos_list = list(range(resin.nb_frame))
+        else:
+            try:
+                pos_list = [resin.get_time_index(time) for time in time_list]
+            except ValueError as error:
+                raise ValueError("{} (possible times: {})".format(error, resin.time))
+        return [resin.time[pos] for pos in pos_list], resin.read_nodes(nodes, varID_list, pos_list)
+
+
+def read_nodes_in_files(filenames, nodes, varID_list=None, time_list=None, mesh_type=None, processes=None):
+    """
+    @brief: read time series at nodes in several files (e.g. members of a batch of simulations)
+    Files are processed in parallel by a pool of processes (each one opens a single file at once,
+    so the number of opened files is bounded by the number of processes)
+    @param filenames <str list>: Serafin filenames
+    @param nodes <int list>: node numbers (1-indexed)
+    @param varID_list <str list>: list of variable ID (all variables if None)
+    @param time_list <float list>: times of the frames to read (exact values, all frames if None)
+    @param mesh_type <str>: expected mesh type ('2D' or '3D', not checked if None)
+    @param processes <int>: number of processes (number of CPUs if None, 1 to read files in the current process)
+    @return <list>: (list of times, numpy 3D-array with shape (nb frame, nb target var, nb target node))
+      for each file (in the order of filenames)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    args = [(filename, nodes, varID_list, time_list, mesh_type) for filename in filenames]
+    if processes == 1 or len(filenames) <= 1:
+        return [_read_nodes_in_file(*arg) for arg in args]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_read_nodes_in_file, *zip(*args)))
+
+
+def _write_frame_block(writer, compute, first, stop, args):
+    """
+    @brief: compute and write frames at positions first to stop - 1 (task of write_frames_in_parallel)
+    @return <int>: number of written frames
+    """
+    pos = first
+    try:
+        for time, values in compute(first, stop, *args):
+            writer.write_entire_frame(pos, time, values)
+            pos += 1
+    finally:
+        writer.close()
+    if pos != stop:
+        raise ValueError("{} frames computed instead of {} (positions {} to {})".format(pos - first, stop - first, first, stop - 1))
+    return stop - first
+
+
+def write_frames_in_parallel(resout, nb_frame, compute, args=(), processes=None):
+    """
+    @brief: compute and write all the frames of an output file with a pool of processes
+    The file is preallocated after its header, then each worker process computes a contiguous range of
+    frames (so it reads the headers of its input files only once) and writes them directly at their
+    positions (frames are not sent back in order to the parent process). Finally, the parent checks the
+    result of every process: in case of error, frames are removed (the file is truncated after its header)
+    and the error is raised.
+    With a single process, frames are computed in the current process and written in order (by the
+    background writer thread of resout if it has one, @see Write)
+    @param resout <Write>: opened output file (header already written)
+    @param nb_frame <int>: number of frames of the output file
+    @param compute <function>: compute(first, stop, *args) iterates over (time, values) of frames at positions
+      first to stop - 1 (values with shape (nb var, nb node)). It has to be defined at module level (picklable)
+      and to open input files itself
+    @param args <tuple>: additional arguments of compute (picklable)
+    @param processes <int>: number of processes (number of CPUs up to MAX_PROCESSES if None, 1 to compute
+      frames in the current process)
+    """
+    if processes is None:
+        processes = min(os.cpu_count() or 1, MAX_PROCESSES)
+    processes = max(1, min(processes, nb_frame))
+
+    if processes == 1:
+        pos = 0
+        for time, values in compute(0, nb_frame, *args):
+            resout.write_entire_frame(time, values)
+            pos += 1
+        if pos != nb_frame:
+            raise ValueError("{} frames computed instead of {}".format(pos, nb_frame))
+        log("{} frames written".format(nb_frame))
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    resout.preallocate(nb_frame)
+    writer = resout.frame_writer()
+    bounds = [nb_frame * i // processes for i in range(processes + 1)]
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(_write_frame_block, writer, compute, first, stop, args)
+                       for first, stop in zip(bounds[:-1], bounds[1:])]
+            for future in futures:
+                future.result()  # raise the error of a worker process
+    except BaseException:
+        os.ftruncate(resout.file.fileno(), resout.headerSize)
+        raise
+    resout.file.seek(0, 2)
+    log("{} frames written by {} processes".format(nb_frame, processes))
+
 if __name__ == "__main__":
     global resin, resout, a
     inname = os.path.join('..', 'examples', 'r2d.slf')
@@ -1 +1 @@
-__all__ = ['common_data', 'Serafin']
+__all__ = ['common_data', 'Serafin', 'chunk_store', 'archive']
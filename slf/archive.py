@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Compressed archive of Serafin results with random access by frame and variable
+
+File layout (little-endian preamble and table):
+    preamble      magic, version, codec, shuffle, Serafin header size, nb frame, table offset
+    header        Serafin header (records copied verbatim)
+    chunks        one compressed chunk per (frame, variable) with the big-endian float32 values
+    table         times (float64) and offsets (uint64) of chunks (nb frame * nb var + 1 values)
+
+Chunks are compressed with zlib or lzma (standard library). With the shuffle filter, the bytes of
+the values are grouped by significance before compression (exponents and high bytes of neighbouring
+nodes are often identical), which improves the compression ratio of float32 fields.
+"""
+
+import io
+import lzma
+import numpy as np
+import os
+import struct
+import sys
+import zlib
+
+from .common_data import log
+from .Serafin import FLOAT_TYPE, Read, Write
+
+ARCHIVE_MAGIC = b'SLFZ'
+ARCHIVE_VERSION = 1
+PREAMBLE = struct.Struct('<4sIBB2xQQQ')
+
+CODECS = ['zlib', 'lzma']
+DEFAULT_LEVEL = {'zlib': 6, 'lzma': 6}
+
+
+def _compress(data, codec, level):
+    if codec == 0:
+        return zlib.compress(data, level)
+    return lzma.compress(data, preset=level)
+
+
+def _decompress(data, codec):
+    if codec == 0:
+        return zlib.decompress(data)
+    return lzma.decompress(data)
+
+
+class ArchiveWrite(Write):
+    """Write a compressed archive (same API as Serafin.Write)"""
+
+    def __init__(self, filename, overwrite=False, dtype=FLOAT_TYPE, codec='zlib', level=None, shuffle=True):
+        """
+        @param codec <str>: compression among CODECS
+        @param level <int>: compression level (or lzma preset), DEFAULT_LEVEL if None
+        @param shuffle <bool>: group bytes by significance before compression
+        """
+        if codec not in CODECS:
+            sys.exit("Unknown codec {} (possible codecs are {})".format(codec, CODECS))
+        Write.__init__(self, filename, overwrite, dtype)
+        self.codec = CODECS.index(codec)
+        self.level = DEFAULT_LEVEL[codec] if level is None else level
+        self.shuffle = shuffle
+        self._header_size = 0
+        self._times = []
+        self._offsets = []
+
+    def __enter__(self):
+        Write.__enter__(self)
+        if not self.file.seekable():
+            self.__exit__(None, None, None)
+            raise io.UnsupportedOperation("an archive can not be written in a stream (its preamble is written at closing)")
+        self.file.write(bytes(PREAMBLE.size))  # written at closing
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None and self.file.seekable():
+            table_offset = self.file.tell()
+            self._offsets.append(table_offset)
+            self.file.write(np.array(self._times, dtype='<f8').tobytes())
+            self.file.write(np.array(self._offsets, dtype='<u8').tobytes())
+            self.file.seek(0, 0)
+            self.file.write(PREAMBLE.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, self.codec, self.shuffle,
+                                          self._header_size, len(self._times), table_offset))
+        return Write.__exit__(self, exc_type, exc_val, exc_tb)
+
+    def write_header(self):
+        """Write Serafin header from attributes"""
+        Write.write_header(self)
+        self._header_size = self.file.tell() - PREAMBLE.size
+
+    def write_entire_frame(self, time, values):
+        """
+        @brief: write all variables/nodes values (a compressed chunk per variable)
+        @param time <float>: time in second
+        @param values <numpy 2D-array>: values to write
+        """
+        self._times.append(struct.unpack('>f', struct.pack('>f', time))[0])  # stored in single precision
+        for i in range(self._nbvar):
+            data = np.asarray(values[i], dtype=self.dtype).astype('>f4')
+            if self.shuffle:
+                data = data.view(np.uint8).reshape(self.nnode, 4).T
+            self._offsets.append(self.file.tell())
+            self.file.write(_compress(data.tobytes(), self.codec, self.level))
+
+    def write_frames(self, times, values, buffer_size=None):
+        """
+        @brief: write a block of frames (each frame is compressed separately)
+        @param buffer_size: unused (for compatibility with Serafin.Write)
+        """
+        for time, frame_values in zip(times, values):
+            self.write_entire_frame(time, frame_values)
+
+    def copy_frames(self, resin, pos_list=None):
+        """
+        @brief: copy frames of a Serafin file (values are compressed, no byte-level copy)
+        """
+        self._copy_frames_values(resin, range(resin.nb_frame) if pos_list is None else pos_list)
+
+    def _copy_bytes(self, src, offset, length):
+        raise io.UnsupportedOperation("raw Serafin records can not be copied in a compressed archive")
+
+    def preallocate(self, nb_frame):
+        raise io.UnsupportedOperation("frames of a compressed archive have no fixed size (they can not be preallocated)")
+
+    def frame_writer(self):
+        raise io.UnsupportedOperation("frames of a compressed archive have no fixed position")
+
+
+class ArchiveRead(Read):
+    """Read a compressed archive (same API as Serafin.Read, except memory mapping)"""
+
+    raw_frames = False
+
+    def __init__(self, filename, dtype=FLOAT_TYPE):
+        Read.__init__(self, filename, dtype, sidecar=False)
+
+    def readHeader(self):
+        """
+        @brief: read header (file caracteristics), time serie and chunk table
+        """
+        magic, version, self.codec, self.shuffle, header_size, nb_frame, table_offset = \
+            PREAMBLE.unpack(self.file.read(PREAMBLE.size))
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            sys.exit("{} is not a Serafin archive (or has an unsupported version)".format(self.fileName))
+        self._read_header_records()
+        self._compute_header_attributes()
+        self.nb_frame = nb_frame
+
+        self.file.seek(table_offset, 0)
+        self._time = np.frombuffer(self.file.read(8 * nb_frame), dtype='<f8').tolist()
+        self._offsets = np.frombuffer(self.file.read(8 * (nb_frame * self._nbvar + 1)), dtype='<u8').astype('int64')
+        self._build_time_index()
+
+        log("{} result (with {} plans) in a {} archive".format(self.type, self.nplan, CODECS[self.codec]))
+
+    def get_time(self):
+        """
+        @brief: nothing to read, the time serie is stored in the chunk table which is read by readHeader
+        """
+        if self._time is None:
+            raise ValueError("the header of {} has to be read before its time serie".format(self.fileName))
+
+    def _memmap_frames(self):
+        raise io.UnsupportedOperation("frames of a compressed archive can not be mapped in memory")
+
+    def refresh(self):
+        raise io.UnsupportedOperation("a compressed archive is written in one go (it can not be refreshed)")
+
+    def _read_frame_values(self, pos, pos_vars, file=None):
+        """
+        @brief: read and decompress variables of a frame
+        @param pos <int>: frame position (0-indexed, negative values count from the end)
+        @param pos_vars <int list>: positions of the target variables in the frame
+        @param file <file object>: opened file to read (self.file by default)
+        @return var <numpy 2D-array>: shape = (nb target var, nb node)
+        """
+        if file is None:
+            file = self.file
+        if pos < 0:
+            pos += self.nb_frame
+        if not 0 <= pos < self.nb_frame:
+            raise IndexError("frame position {} is not in range [0, {}[".format(pos, self.nb_frame))
+
+        var = np.empty([len(pos_vars), self.nnode], dtype=self.dtype)
+        for i, pos_var in enumerate(pos_vars):
+            chunk = pos * self._nbvar + pos_var
+            file.seek(self._offsets[chunk], 0)
+            data = _decompress(file.read(self._offsets[chunk + 1] - self._offsets[chunk]), self.codec)
+            if self.shuffle:
+                data = np.frombuffer(data, dtype=np.uint8).reshape(4, self.nnode).T.tobytes()
+            var[i] = np.frombuffer(data, dtype='>f4')
+        return var
+
+    def read_frames(self, start=0, stop=None, step=1, varID_list=None):
+        """
+        @brief: read a block of frames
+        @param start, stop, step <int>: frame positions, same meaning as for a slice
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @return var <numpy 3D-array>: shape = (nb frame, nb target var, nb node)
+        """
+        if varID_list is None:
+            varID_list = self.varID
+        pos_vars = self._pos_vars(varID_list)
+        positions = range(self.nb_frame)[start:stop:step]
+        var = np.empty([len(positions), len(pos_vars), self.nnode], dtype=self.dtype)
+        for i, pos in enumerate(positions):
+            var[i] = self._read_frame_values(pos, pos_vars)
+        return var
+
+    def read_nodes(self, nodes, varID_list=None, pos_list=None, max_gap=None):
+        """
+        @brief: read time series of variables at a subset of nodes (chunks are entirely decompressed)
+        @param nodes <int list>: node numbers (1-indexed)
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @param pos_list <int list>: frame positions (all frames if None)
+        @param max_gap: unused (for compatibility with Serafin.Read)
+        @return var <numpy 3D-array>: shape = (nb frame, nb target var, nb target node)
+        """
+        if varID_list is None:
+            varID_list = self.varID
+        if pos_list is None:
+            pos_list = range(self.nb_frame)
+        pos_vars = self._pos_vars(varID_list)
+        index = np.asarray(nodes, dtype=int) - 1
+        if len(index) > 0 and (index.min() < 0 or index.max() >= self.nnode):
+            raise IndexError("node numbers should be in range [1, {}]".format(self.nnode))
+
+        var = np.empty([len(pos_list), len(pos_vars), len(index)], dtype=self.dtype)
+        for i, pos in enumerate(pos_list):
+            var[i] = self._read_frame_values(pos, pos_vars)[:, index]
+        return var
+
+
+def compress(resin, outname, overwrite=False, codec='zlib', level=None, shuffle=True):
+    """
+    @brief: write a compressed archive of an opened Serafin file
+    @param resin <Serafin.Read>: opened Serafin file (header already read)
+    """
+    with ArchiveWrite(outname, overwrite, codec=codec, level=level, shuffle=shuffle) as resout:
+        resout.copy_header(resin)
+        resout.write_header()
+        for time, values in resin.iter_frames():
+            resout.write_entire_frame(time, values)
+    log("Compression ratio: {:.2f}".format(os.path.getsize(resin.fileName) / os.path.getsize(outname)))
+
+
+def extract(resin, outname, overwrite=False):
+    """
+    @brief: write the Serafin file of an opened archive
+    @param resin <ArchiveRead>: opened archive (header already read)
+    """
+    with Write(outname, overwrite) as resout:
+        resout.copy_header(resin)
+        resout.write_header()
+        for time, values in resin.iter_frames():
+            resout.write_entire_frame(time, values)
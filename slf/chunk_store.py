@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Node-major chunked store of Serafin results
+
+Serafin files are frame-major: reading the time serie of a node requires to go
+through the whole file. A chunked store is a directory with the values of a
+Serafin file transposed and tiled by (node block x frame block):
+
+    <dirname>/meta.npz                      header, time serie and block sizes
+    <dirname>/var<j>/<inode>_<iframe>.npy   values of variable j with shape (nb node, nb frame)
+
+Chunks are native-endian npy files (memory-mapped at reading), so a time serie
+is read with sequential accesses in a few chunks.
+"""
+
+from glob import glob
+import numpy as np
+import os
+import shutil
+import sys
+import zipfile
+
+from .common_data import log
+from .Serafin import FLOAT_TYPE, BLOCK_SIZE
+
+STORE_VERSION = 1
+META_FILE = 'meta.npz'
+
+# Default number of nodes in a chunk
+NODE_BLOCK = 4096
+
+
+def _chunk_name(dirname, pos_var, inode, iframe):
+    return os.path.join(dirname, 'var{}'.format(pos_var), '{}_{}.npy'.format(inode, iframe))
+
+
+def convert(resin, dirname, varID_list=None, node_block=NODE_BLOCK, frame_block=None, overwrite=False):
+    """
+    @brief: write a chunked store from a Serafin file
+    Frames are read by blocks of frame_block frames, transposed and cut in blocks of node_block nodes
+    @param resin <Serafin.Read>: opened Serafin file (header already read)
+    @param dirname <str>: directory of the store
+    @param varID_list <str list>: list of variable ID (all variables if None)
+    @param node_block <int>: number of nodes in a chunk
+    @param frame_block <int>: number of frames in a chunk (memory budget of BLOCK_SIZE for a block of frames if None)
+    @param overwrite <bool>: replace an existing store
+    """
+    if varID_list is None:
+        varID_list = resin.varID
+    if frame_block is None:
+        frame_block = max(1, BLOCK_SIZE // (4 * len(varID_list) * resin.nnode))
+    meta_name = os.path.join(dirname, META_FILE)
+    if os.path.exists(meta_name):
+        if not overwrite:
+            sys.exit("Store {} already exists (remove the directory or change the option and then re-run the program)".format(dirname))
+        os.remove(meta_name)  # the store is invalid until its end
+
+    # Chunks of a previous conversion (possibly with other block sizes or variables) are removed
+    for var_dir in glob(os.path.join(dirname, 'var[0-9]*')):
+        if os.path.isdir(var_dir):
+            shutil.rmtree(var_dir)
+
+    for pos_var in range(len(varID_list)):
+        os.makedirs(os.path.join(dirname, 'var{}'.format(pos_var)), exist_ok=True)
+
+    for iframe, start in enumerate(range(0, resin.nb_frame, frame_block)):
+        log("Convert frames {} to {}".format(start, min(start + frame_block, resin.nb_frame) - 1))
+        block = resin.read_frames(start, start + frame_block, varID_list=varID_list)
+        for pos_var in range(len(varID_list)):
+            for inode, first in enumerate(range(0, resin.nnode, node_block)):
+                chunk = np.ascontiguousarray(block[:, pos_var, first:first + node_block].T)
+                np.save(_chunk_name(dirname, pos_var, inode, iframe), chunk)
+
+    # Meta data are written at the end: a store is valid only if it was entirely written
+    var_pos = [resin.varID.index(varID) for varID in varID_list]
+    np.savez(meta_name,
+             version=STORE_VERSION,
+             title=np.frombuffer(resin.title, dtype=np.uint8),
+             type=resin.type,
+             var_ids=np.array(varID_list),
+             var_names=np.frombuffer(b''.join(resin.varNames[pos] for pos in var_pos), dtype=np.uint8),
+             var_units=np.frombuffer(b''.join(resin.varUnits[pos] for pos in var_pos), dtype=np.uint8),
+             nnode=resin.nnode, x=resin.x, y=resin.y,
+             time=np.array(resin.time, dtype='float64'),
+             node_block=node_block, frame_block=frame_block)
+    log("Store {} written ({} frames, {} variables)".format(dirname, resin.nb_frame, len(varID_list)))
+
+
+class ChunkStore:
+    """Read a node-major chunked store (written by convert)"""
+
+    def __init__(self, dirname, dtype=FLOAT_TYPE):
+        """
+        @param dirname <str>: directory of the store
+        @param dtype <str>: type of the returned variable values (FLOAT_TYPE by default)
+        """
+        self.dirname = dirname
+        self.dtype = np.dtype(dtype)
+        try:
+            with np.load(os.path.join(dirname, META_FILE)) as meta:
+                if int(meta['version']) != STORE_VERSION:
+                    sys.exit("Store {} has an unsupported version".format(dirname))
+                self.title = meta['title'].tobytes()
+                self.type = str(meta['type'])
+                self.varID = [str(varID) for varID in meta['var_ids']]
+                names = meta['var_names'].tobytes()
+                units = meta['var_units'].tobytes()
+                self.nnode = int(meta['nnode'])
+                self.x = meta['x']
+                self.y = meta['y']
+                self.time = meta['time'].tolist()
+                self.node_block = int(meta['node_block'])
+                self.frame_block = int(meta['frame_block'])
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            sys.exit("Store {} does not exist, is incomplete or corrupted".format(dirname))
+        self.varNames = [names[16*i:16*(i+1)] for i in range(len(self.varID))]
+        self.varUnits = [units[16*i:16*(i+1)] for i in range(len(self.varID))]
+        self.nb_frame = len(self.time)
+
+    def _pos_vars(self, varID_list):
+        if varID_list is None:
+            return list(range(len(self.varID)))
+        return [self.varID.index(varID) for varID in varID_list]
+
+    def _read(self, pos_list, index, pos_vars):
+        """
+        @brief: read values of variables at frame positions and nodes (0-indexed)
+        Only the chunks containing target frames and nodes are opened (memory-mapped)
+        @return var <numpy 3D-array>: shape = (nb frame, nb target var, nb target node)
+        """
+        pos_list = np.asarray(pos_list, dtype=int)
+        pos_list = np.where(pos_list < 0, pos_list + self.nb_frame, pos_list)  # position from the end
+        var = np.empty([len(pos_list), len(pos_vars), len(index)], dtype=self.dtype)
+        node_chunks = index // self.node_block
+        frame_chunks = pos_list // self.frame_block
+        for inode in np.unique(node_chunks):
+            node_sel = np.where(node_chunks == inode)[0]
+            rows = index[node_sel] - inode * self.node_block
+            for iframe in np.unique(frame_chunks):
+                frame_sel = np.where(frame_chunks == iframe)[0]
+                cols = pos_list[frame_sel] - iframe * self.frame_block
+                for j, pos_var in enumerate(pos_vars):
+                    chunk = np.load(_chunk_name(self.dirname, pos_var, inode, iframe), mmap_mode='r')
+                    var[np.ix_(frame_sel, [j], node_sel)] = chunk[np.ix_(rows, cols)].T[:, np.newaxis, :]
+        return var
+
+    def read_nodes(self, nodes, varID_list=None, pos_list=None):
+        """
+        @brief: read time series of variables at a subset of nodes (same result as Serafin.Read.read_nodes)
+        @param nodes <int list>: node numbers (1-indexed)
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @param pos_list <int list>: frame positions (all frames if None)
+        @return var <numpy 3D-array>: shape = (nb frame, nb target var, nb target node)
+        """
+        if pos_list is None:
+            pos_list = range(self.nb_frame)
+        index = np.asarray(nodes, dtype=int) - 1
+        if len(index) > 0 and (index.min() < 0 or index.max() >= self.nnode):
+            raise IndexError("node numbers should be in range [1, {}]".format(self.nnode))
+        return self._read(pos_list, index, self._pos_vars(varID_list))
+
+    def read_frames(self, start=0, stop=None, step=1, varID_list=None):
+        """
+        @brief: read a block of frames (same result as Serafin.Read.read_frames)
+        @param start, stop, step <int>: frame positions, same meaning as for a slice
+        @param varID_list <str list>: list of variable ID (all variables if None)
+        @return var <numpy 3D-array>: shape = (nb frame, nb target var, nb node)
+        """
+        positions = range(self.nb_frame)[start:stop:step]
+        return self._read(positions, np.arange(self.nnode), self._pos_vars(varID_list))
+
+    def read_vars_in_frame_at_pos(self, pos, varID_list):
+        """
+        @brief: read a frame for a subset of variables
+        @param pos <int>: frame position
+        @param varID_list <str list>: list of variable ID
+        @return var <numpy 2D-array>: shape = (nb target var, nb node)
+        """
+        return self.read_frames(pos, pos + 1 if pos != -1 else None, 1, varID_list)[0]
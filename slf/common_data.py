@@ -1,35 +1,69 @@
+import csv
 import os
-import pandas as pd
 
 # Manage verbosity
 verbose = True
+log_file = None  # standard output (None) or sys.stderr (if Serafin data are written on standard output)
 def log(text):
-    if verbose: print(text)
+    if verbose: print(text, file=log_file)
 
 baseFolder = os.path.dirname(os.path.realpath(__file__))
-var2D = pd.read_csv(os.path.join(baseFolder, 'data', 'Serafin_var2D.csv'), index_col=0, header=0, sep=',')
-var3D = pd.read_csv(os.path.join(baseFolder, 'data', 'Serafin_var3D.csv'), index_col=0, header=0, sep=',')
+
+def readVarTable(filename):
+    """
+    Read a CSV table of variables (lines starting with '#' are comments) and build dict lookups:
+    * table: {varID: {'fr': name, 'en': name, 'unit': unit}}
+    * index: {lang: {name: varID}}
+    (the first line is kept for duplicated varID or names)
+    """
+    table = {}
+    index = {}
+    with open(os.path.join(baseFolder, 'data', filename), newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(line for line in csvfile if not line.startswith('#'))
+        header = next(reader)
+        for row in reader:
+            varID = row[0]
+            table.setdefault(varID, dict(zip(header[1:], row[1:])))
+            for lang, name in zip(header[1:], row[1:]):
+                if lang != 'unit':
+                    index.setdefault(lang, {}).setdefault(name, varID)
+    return table, index
+
+var2D, varIndex2D = readVarTable('Serafin_var2D.csv')
+var3D, varIndex3D = readVarTable('Serafin_var3D.csv')
 
 def varTable(type):
-    if type is '2D':
-        return var2D
-    elif type is '3D':
-        return var3D
+    """Return the table of variables as a pandas DataFrame (index = varID)"""
+    import pandas as pd
+    if type == '2D':
+        filename = 'Serafin_var2D.csv'
+    elif type == '3D':
+        filename = 'Serafin_var3D.csv'
+    else:
+        raise ValueError("Unknown mesh type {} (possible types are '2D' and '3D')".format(type))
+    return pd.read_csv(os.path.join(baseFolder, 'data', filename), index_col=0, header=0, sep=',')
+
+def varIDFromName(type, lang, name):
+    """Return the varID of a variable name (str of 16 characters), None if it is unknown"""
+    if type == '2D':
+        return varIndex2D[lang].get(name)
+    elif type == '3D':
+        return varIndex3D[lang].get(name)
 
 def stringForSerafin(string):
     return bytes(string.ljust(16), encoding='utf-8')
 
 def varName(type, lang, varID):
-    if type is '2D':
-        return stringForSerafin(var2D[lang][varID])
-    elif type is '3D':
-        return stringForSerafin(var3D[lang][varID])
+    if type == '2D':
+        return stringForSerafin(var2D[varID][lang])
+    elif type == '3D':
+        return stringForSerafin(var3D[varID][lang])
 
 def varUnit(type, lang, varID):
-    if type is '2D':
-        return stringForSerafin(var2D['unit'][varID])
-    elif type is '3D':
-        return stringForSerafin(var3D['unit'][varID])
+    if type == '2D':
+        return stringForSerafin(var2D[varID]['unit'])
+    elif type == '3D':
+        return stringForSerafin(var3D[varID]['unit'])
 
 #
 # telemac3d/sources/nomvar_telemac3d.f (V6P3)
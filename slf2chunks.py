@@ -0,0 +1,30 @@
+#!/usr/bin/python3
+"""
+@brief:
+Convert a Serafin file into a node-major chunked store (for time series analysis)
+
+@info:
+* The store is a directory of npy files, each one with the values of a variable for a block of nodes and a block of frames
+* Time series (and frames) are then read with slf.chunk_store.ChunkStore (same API as Serafin.Read.read_nodes and read_frames)
+* Reading a time serie at a node opens only the chunks of its node block (instead of reading the entire Serafin file)
+"""
+
+from common.arg_command_line import myargparse
+from slf import Serafin, common_data, chunk_store
+
+
+parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
+parser.add_argument("inname", help="Serafin input filename")
+parser.add_argument("outdir", help="output directory of the store")
+parser.add_argument("--var", nargs='+', help="list of variables to convert (all by default)")
+parser.add_argument("--node_block", type=int, help="number of nodes in a chunk", default=chunk_store.NODE_BLOCK)
+parser.add_argument("--frame_block", type=int, help="number of frames in a chunk (default: computed from the memory budget)")
+args = parser.parse_args()
+
+common_data.verbose = args.verbose
+
+with Serafin.Read(args.inname) as resin:
+    resin.readHeader()
+    resin.get_time()
+
+    chunk_store.convert(resin, args.outdir, args.var, args.node_block, args.frame_block, args.force)
@@ -12,6 +12,9 @@ Extraire une partie d'un slf
 ** M = sqrt(U²+V²)
 ** US = f(W,H,M)
 ** TAU = rho*US²
+
+@info:
+* inname and outname can be `-` to read from standard input and write on standard output (e.g. to pipe with slf_tempagg)
 """
 
 import sys
@@ -21,8 +24,8 @@ from slf import Serafin, common_data
 
 
 parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
-parser.add_argument("inname", help="Serafin input filename")
-parser.add_argument("outname", help="Serafin output filename")
+parser.add_argument("inname", help="Serafin input filename (- for standard input)")
+parser.add_argument("outname", help="Serafin output filename (- for standard output)")
 parser.add_argument("--var2del", nargs='+', help="variable(s) to delete", default=[])
 parser.add_argument("--var2keep", nargs='+', help="variable(s) to keep", default=[])
 parser.add_argument("--ech", type=int, help="frequency sampling of inname", default=1)
@@ -32,6 +35,8 @@ parser.add_argument("--shift", type=float, nargs=2, help="translation (x_distanc
 args = parser.parse_args()
 
 common_data.verbose = args.verbose
+if args.outname == Serafin.STDIO:
+    common_data.log_file = sys.stderr  # standard output is kept for Serafin data
 
 with Serafin.Read(args.inname) as resin:
     resin.readHeader()
@@ -53,12 +58,20 @@ with Serafin.Read(args.inname) as resin:
         common_data.log("Variables to export: {}".format(resout.varID))
         resout.write_header()
 
+        def is_selected(pos, time):
+            return args.start <= time <= args.end and pos % args.ech == 0
+
         resout.time = []
-        for i, time in enumerate(resin.time):
-            if args.start <= time <= args.end:
-                if i % args.ech == 0:
+        if resin.streaming:
+            # Times are unknown before reading: frames are read sequentially and filtered
+            for pos, (time, var) in enumerate(resin.iter_frames(resout.varID)):
+                if is_selected(pos, time):
                     resout.time.append(time)
-                    var = resin.read_vars_in_frame(time, resout.varID)
                     resout.write_entire_frame(time, var)
+        else:
+            # Selected frames and variables are copied without decoding values
+            pos_list = [pos for pos, time in enumerate(resin.time) if is_selected(pos, time)]
+            resout.time = [resin.time[pos] for pos in pos_list]
+            resout.copy_frames(resin, pos_list)
 
         common_data.log("Write {} frames from the {} initial frames of input".format(len(resout.time), len(resin.time)))
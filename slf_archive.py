@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+"""
+@brief:
+Compress a Serafin file into an archive with random access (or extract a Serafin file from an archive)
+
+@info:
+* Each variable of each frame is compressed separately (zlib or lzma) and a table of chunk offsets is stored at the end of the archive
+* The archive is read with slf.archive.ArchiveRead (same API as Serafin.Read): a frame or a variable is decompressed without reading the rest of the archive
+* The compression is lossless: an extracted file has the same values as the original one
+
+@features:
+* codec among zlib (faster) and lzma (smaller archives) with a compression level
+* optional byte-shuffle of float32 values before compression (enabled by default)
+"""
+
+from common.arg_command_line import myargparse
+from slf import Serafin, common_data, archive
+
+
+parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
+parser.add_argument("inname", help="Serafin input filename (or archive with --extract)")
+parser.add_argument("outname", help="archive output filename (or Serafin file with --extract)")
+parser.add_argument("--extract", help="extract a Serafin file from an archive", action="store_true")
+parser.add_argument("--codec", help="compression codec", choices=archive.CODECS, default='zlib')
+parser.add_argument("--level", type=int, help="compression level (0-9)")
+parser.add_argument("--no_shuffle", help="disable the byte-shuffle filter", action="store_true")
+args = parser.parse_args()
+
+common_data.verbose = args.verbose
+
+if args.extract:
+    with archive.ArchiveRead(args.inname) as resin:
+        resin.readHeader()
+        archive.extract(resin, args.outname, args.force)
+else:
+    with Serafin.Read(args.inname) as resin:
+        resin.readHeader()
+        resin.get_time()
+        archive.compress(resin, args.outname, args.force, args.codec, args.level, not args.no_shuffle)
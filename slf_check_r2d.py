@@ -12,6 +12,9 @@ from slf import common_data, Serafin
 
 parser = myargparse(description=__doc__, add_args=['verbose'])
 parser.add_argument("resname", help="Serafin input filename")
+parser.add_argument("--follow", help="process new frames while the file is being written", action="store_true")
+parser.add_argument("--interval", type=float, help="delay (in seconds) between two checks of the file (with --follow)", default=5.)
+parser.add_argument("--timeout", type=float, help="stop after this duration (in seconds) without new frame (with --follow)", default=3600.)
 args = parser.parse_args()
 
 common_data.verbose = args.verbose
@@ -22,8 +25,15 @@ with open('arf.csv', 'w') as fileout:
         res.get_time()
 
         fileout.write(';'.join(['time', 'H_min', 'Vmax'])+'\n')
-        for time in res.time:
-            H = res.read_var_in_frame(time, 'H')
-            M = res.read_var_in_frame(time, 'M')
+        if not args.follow and res.load_stats():
+            # Extremes are taken from the statistics index (built with slf_index.py --stats)
+            H_min = res.stats['min'][:, res.varID.index('H')]
+            M_max = res.stats['max'][:, res.varID.index('M')]
+            frames = [(time, (H, M)) for time, H, M in zip(res.time, H_min, M_max)]
+        elif args.follow:
+            frames = res.follow(['H', 'M'], interval=args.interval, timeout=args.timeout)
+        else:
+            frames = res.iter_frames(['H', 'M'])
+        for time, (H, M) in frames:
             fileout.write(';'.join(str(x) for x in [time, H.min(), M.max()])+'\n')
             fileout.flush()
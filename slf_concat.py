@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+"""
+@brief:
+Concatenate Serafin files of successive runs (restarts/continuations of a simulation) in a single file
+
+@info:
+* files are given in the order of the simulation and must have exactly the same mesh
+  (connectivity, boundary nodes and coordinates, not only the same number of nodes and elements)
+* frames are copied as raw bytes (values are not decoded), so the concatenation is bounded by disk throughput
+* to avoid the copy, the files can be listed (one filename per line) in a `.slflist` file which is read as
+  a single Serafin file by all the scripts (slf.Serafin.MultiRead, with the same overlap policies)
+
+@features:
+* overlapping or duplicated times (a restart begins before the end of the previous file) are removed with
+  the policy given by --overlap:
+** last (default): frames of the later file supersede the ones of the earlier file
+** first: frames of the earlier file are kept
+** error: stop if times are not strictly increasing
+* select variables (all the variables of the first file by default)
+
+@warnings:
+* the header (title, date...) of the first file is written in the output file
+"""
+
+import sys
+
+from common.arg_command_line import myargparse
+from slf import Serafin, common_data
+
+
+def concat(slf_list, outname, overwrite=False, overlap='last', varID_list=None):
+    """
+    @brief: concatenate Serafin files with the same mesh
+    @param slf_list <str list>: Serafin filenames (in the order of the simulation)
+    @param outname <str>: Serafin output filename
+    @param overwrite <bool>: overwrite the output file
+    @param overlap <str>: policy among Serafin.OVERLAP_POLICIES for overlapping times
+    @param varID_list <str list>: list of variable ID (all the variables of the first file if None)
+    """
+    # Check headers and merge time series (a sidecar index avoids reading the frame times)
+    time_lists = []
+    for i, slf_name in enumerate(slf_list):
+        with Serafin.Read(slf_name) as resin:
+            resin.readHeader()
+            resin.get_time()
+            if i == 0:
+                first = resin
+                if varID_list is None:
+                    varID_list = resin.varID
+            elif not resin.identicalMesh(first):
+                sys.exit("ERROR: mesh of {} is different from the mesh of {}".format(slf_name, slf_list[0]))
+            missing = [varID for varID in varID_list if varID not in resin.varID]
+            if missing:
+                sys.exit("ERROR: variable(s) {} not found in {}".format(missing, slf_name))
+            time_lists.append(resin.time)
+
+    try:
+        pos_lists = Serafin.merge_time_series(time_lists, overlap)
+    except ValueError as error:
+        sys.exit("ERROR: {}".format(error))
+
+    with Serafin.Write(outname, overwrite) as resout:
+        resout.copy_header(first)
+        var2del = [varID for varID in first.varID if varID not in varID_list]
+        if var2del:
+            resout.removeVarIDs(var2del)
+        resout.write_header()
+
+        for slf_name, times, pos_list in zip(slf_list, time_lists, pos_lists):
+            if len(pos_list) != len(times):
+                common_data.log("{} frame(s) of {} removed (overlapping times)".format(len(times) - len(pos_list), slf_name))
+            if not pos_list:
+                continue
+            with Serafin.Read(slf_name) as resin:
+                resin.readHeader()
+                resin.get_time()
+                common_data.log("Copy {} frames of {} (from {} to {})".format(
+                    len(pos_list), slf_name, times[pos_list[0]], times[pos_list[-1]]))
+                resout.copy_frames(resin, pos_list)
+
+    common_data.log("{} frames written in {}".format(sum(len(pos_list) for pos_list in pos_lists), outname))
+
+
+if __name__ == '__main__':
+    parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
+    parser.add_argument("slf_list", nargs='+', help="Serafin input filenames (in the order of the simulation)")
+    parser.add_argument("outname", help="Serafin output filename")
+    parser.add_argument("--overlap", help="policy for overlapping times (default: last)",
+                        choices=Serafin.OVERLAP_POLICIES, default='last')
+    parser.add_argument("--var", nargs='+', help="variable(s) to write (all by default)")
+    args = parser.parse_args()
+
+    common_data.verbose = args.verbose
+
+    try:
+        concat(args.slf_list, args.outname, args.force, args.overlap, args.var)
+    except FileExistsError as error:
+        sys.exit("ERROR: {}".format(error))
@@ -5,6 +5,10 @@ Calcule la différence entre inname1 et inname2 pour chaque variable et enregitr
 
 @prerequisites:
 Les maillages sont identiques (tableaux x, y, ikle, ipobo)
+
+@features:
+* les enregistrements sont calculés en parallèle par plusieurs processus (option `--processes`) qui les écrivent
+  directement à leur position dans le fichier de sortie (pré-alloué)
 """
 #FIXME: remove velMag
 
@@ -16,71 +20,104 @@ from common.arg_command_line import myargparse
 from slf import Serafin, common_data
 
 
-parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
-parser.add_argument("inname1", help="reference Serafin input filename")
-parser.add_argument("inname2", help="Serafin input filename to subtract")
-parser.add_argument("outname", help="Serafin output filename")
-parser.add_argument("--velMag", help="compute velocity 2D (or 3D) difference instead of a simple difference for U, V (and W)", action="store_true")
-args = parser.parse_args()
-
-common_data.verbose = args.verbose
-
-with Serafin.Read(args.inname1) as res1, Serafin.Read(args.inname2) as res2:
-    res1.readHeader()
-    res2.readHeader()
-
-    res1.get_time()
-    res2.get_time()
-
-    # Check coherence between input files
-    if not res1.sameMesh(res2):
-        sys.exit("mesh {} and {} are different".format(inname1, inname2))
+def compute_frames(first, stop, inname1, inname2, pos_list1, pos_list2, readVarID, nb_normal, velMag):
+    """
+    @brief: compute differences of frames at positions first to stop - 1 of the output file (task of a worker process)
+    @param pos_list1, pos_list2 <int list>: positions of the common frames in both files
+    @param readVarID <str list>: variables read in both files (velocity components at the end with velMag)
+    @param nb_normal <int>: number of variables with a simple difference
+    """
+    with Serafin.Read(inname1) as res1, Serafin.Read(inname2) as res2:
+        res1.readHeader()
+        res2.readHeader()
 
-    with Serafin.Write(args.outname, args.force) as resout:
-        resout.copy_header(res1)
+        res1.get_time()
+        res2.get_time()
 
-        # Find common variables
-        varID_list = res1.commonVarID(res2)
-        if args.velMag:
-            try:
-                varID_list.remove('U')
-                varID_list.remove('V')
-                varID_list.append('UV')
-            except ValueError:
-                sys.exit("ERROR: a velocity variable (U, V or UV) could not be found in file")
-        resout.assignVarIDs(varID_list)
+        # Frames of both files are read in advance (in background threads)
+        frames1 = res1.iter_frames(readVarID, pos_list1[first:stop])
+        frames2 = res2.iter_frames(readVarID, pos_list2[first:stop])
 
-        # Find common time
-        resout.time = res1.commonTime(res2)
-        resout.write_header()
-
-        if args.velMag: normalVarID = resout.varID[:-1]  # ignore UV to read serafin files
-        else: normalVarID = resout.varID
-
-        for time in resout.time:
+        for (time, read1), (_, read2) in zip(frames1, frames2):
             # Compute simple differences for each variables
-            var1 = res1.read_vars_in_frame(time, normalVarID)
-            var2 = res2.read_vars_in_frame(time, normalVarID)
+            var1 = read1[:nb_normal]
+            var2 = read2[:nb_normal]
             values = var1-var2
 
-            if args.velMag:
+            if velMag:
                 # Compute velocity magnitude difference
-                U1 = res1.read_var_in_frame(time, 'U')
-                V1 = res1.read_var_in_frame(time, 'V')
-                U2 = res2.read_var_in_frame(time, 'U')
-                V2 = res2.read_var_in_frame(time, 'V')
+                U1, V1 = read1[nb_normal], read1[nb_normal+1]
+                U2, V2 = read2[nb_normal], read2[nb_normal+1]
                 if res1.type == '2D':
                     V2D1 = np.sqrt(np.power(U1, 2) + np.power(V1, 2))
                     V2D2 = np.sqrt(np.power(U2, 2) + np.power(V2, 2))
                     values = np.vstack((values, V2D1-V2D2))
                 elif res1.type == '3D':
-                    W1 = res1.read_var_in_frame(time, 'W')
-                    W2 = res2.read_var_in_frame(time, 'W')
+                    W1 = read1[nb_normal+2]
+                    W2 = read2[nb_normal+2]
                     V3D1 = np.sqrt(np.power(U1, 2) + np.power(V1, 2) + np.power(W1, 2))
                     V3D2 = np.sqrt(np.power(U2, 2) + np.power(V2, 2) + np.power(W2, 2))
                     values = np.vstack((values, V3D1-V3D2))
 
-            resout.write_entire_frame(time, values)
+            yield (time, values)
+
 
-        common_data.log("{} frames were ignored from res1".format(len(res1.time)-len(resout.time)))
-        common_data.log("{} frames were ignored from res2".format(len(res2.time)-len(resout.time)))
+if __name__ == '__main__':  # required by the pool of processes
+    parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
+    parser.add_argument("inname1", help="reference Serafin input filename")
+    parser.add_argument("inname2", help="Serafin input filename to subtract")
+    parser.add_argument("outname", help="Serafin output filename")
+    parser.add_argument("--velMag", help="compute velocity 2D (or 3D) difference instead of a simple difference for U, V (and W)", action="store_true")
+    parser.add_argument("--processes", type=int, help="number of processes (number of CPUs up to 4 by default)")
+    args = parser.parse_args()
+
+    common_data.verbose = args.verbose
+
+    with Serafin.Read(args.inname1) as res1, Serafin.Read(args.inname2) as res2:
+        res1.readHeader()
+        res2.readHeader()
+
+        res1.get_time()
+        res2.get_time()
+
+        # Check coherence between input files
+        if not res1.sameMesh(res2):
+            sys.exit("mesh {} and {} are different".format(args.inname1, args.inname2))
+
+        with Serafin.Write(args.outname, args.force, queue_size=Serafin.WRITE_QUEUE_SIZE) as resout:
+            resout.copy_header(res1)
+
+            # Find common variables
+            varID_list = res1.commonVarID(res2)
+            if args.velMag:
+                try:
+                    varID_list.remove('U')
+                    varID_list.remove('V')
+                    varID_list.append('UV')
+                except ValueError:
+                    sys.exit("ERROR: a velocity variable (U, V or UV) could not be found in file")
+            resout.assignVarIDs(varID_list)
+
+            # Find common time
+            resout.time = res1.commonTime(res2)
+            resout.write_header()
+
+            if args.velMag: normalVarID = resout.varID[:-1]  # ignore UV to read serafin files
+            else: normalVarID = resout.varID
+            nb_normal = len(normalVarID)
+
+            # Velocity components are read at the end of each frame
+            readVarID = list(normalVarID)
+            if args.velMag:
+                readVarID += ['U', 'V', 'W'] if res1.type == '3D' else ['U', 'V']
+
+            # Frames are computed by worker processes which write them directly at their position in the output file
+            # (or by this process, with a background writer thread, if there is a single process)
+            pos_list1 = [res1.get_time_index(time) for time in resout.time]
+            pos_list2 = [res2.get_time_index(time) for time in resout.time]
+            Serafin.write_frames_in_parallel(resout, len(resout.time), compute_frames,
+                                             (args.inname1, args.inname2, pos_list1, pos_list2, readVarID, nb_normal,
+                                              args.velMag), args.processes)
+
+            common_data.log("{} frames were ignored from res1".format(len(res1.time)-len(resout.time)))
+            common_data.log("{} frames were ignored from res2".format(len(res2.time)-len(resout.time)))
@@ -47,9 +47,8 @@ with Serafin.Read(args.inname) as res:
 
         var_ref = res.read_vars_in_frame(res.time[0], normalVarID)
 
-        for time in resout.time:
+        for time, var in res.iter_frames(normalVarID):
             # Compute simple differences for each variables
-            var = res.read_vars_in_frame(time, normalVarID)
             values = var - var_ref
 
             # if args.velMag:
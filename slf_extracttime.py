@@ -34,7 +34,7 @@ def getSelaFrame(inname, outname, overwrite, posList, timeList):
         if timeList:
             posList = []
             for time in timeList:
-                posList.append(min(range(len(resin.time)), key=lambda i: abs(resin.time[i]-time)))
+                posList.append(resin.get_nearest_time_index(time))
             print("Position(s) found = {}".format(posList))
 
         with Serafin.Write(outname, overwrite) as resout:
@@ -47,8 +47,9 @@ def getSelaFrame(inname, outname, overwrite, posList, timeList):
                 except IndexError:
                     sys.exit("ERROR: position n°{} is not in range [{},{}] (or in opposite interval)".format(pos,1,len(resin.time)))
                 common_data.log("Write frame number {} (time = {})".format(pos, time))
-                var = resin.read_entire_frame(time)
-                resout.write_entire_frame(time, var)
+
+            # Frames are copied with a single call (runs of consecutive frames are copied at once)
+            resout.copy_frames(resin, posList)
 
 if __name__ == '__main__':
     parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+"""
+@brief:
+Build (or refresh) the sidecar index of Serafin files
+
+@info:
+* The index is written next to the Serafin file (same name with the `.slfidx` suffix)
+* It contains the decoded header, the time serie, the frame offsets and the size/mtime of the Serafin file
+* When it exists, the index is used by all the scripts to open the Serafin file without reading its header and frame times again
+* An outdated index (Serafin file modified since indexation) is automatically rebuilt at opening
+* With --stats, statistics (min/max/mean/NaN count) of every variable in every frame are also computed
+  in a single pass and written next to the Serafin file (`.slfstats` suffix), e.g. to find frames
+  where a variable exceeds a threshold without reading frame values (Serafin.Read.find_frames)
+"""
+
+from common.arg_command_line import myargparse
+from slf import Serafin, common_data
+
+
+parser = myargparse(description=__doc__, add_args=['verbose'])
+parser.add_argument("slf_list", nargs='+', help="Serafin input filename(s)")
+parser.add_argument("--stats", help="build the statistics index", action="store_true")
+args = parser.parse_args()
+
+common_data.verbose = args.verbose
+
+for slf_name in args.slf_list:
+    with Serafin.Read(slf_name, sidecar=True) as resin:
+        resin.readHeader()
+        print("{}: {} frames indexed in {}".format(slf_name, resin.nb_frame, resin.sidecarName))
+        if args.stats and not resin.load_stats():
+            resin.compute_stats(save=True)
+            print("{}: statistics written in {}".format(slf_name, resin.statsName))
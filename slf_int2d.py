@@ -67,11 +67,14 @@ with Serafin.Read(args.resname) as res:
     for varID in varID_list:
         values_empty[varID] = np.nan
 
-    # Read results
+    # Read results (only at the nodes involved in the interpolation)
     if varID_list is None: varID_list = res.varID
+    nodes = sorted(set(node for _, ponderation in ponderations for node in ponderation))
+    node_index = {node: i for i, node in enumerate(nodes)}
+    series = res.read_nodes(nodes, varID_list)
+
     first = True
-    for time in res.time:
-        var = res.read_vars_in_frame(time, varID_list)
+    for time, var in zip(res.time, series):
 
         # values = Serafin.interpolate_from_ponderations(var, ponderations, points, varID_list, add_columns={'time': time}, digits=None)
 
@@ -82,7 +85,7 @@ with Serafin.Read(args.resname) as res:
         for ptID, ponderation in ponderations:
             row_values = np.zeros(var.shape[0])  # len(varID_list)
             for node, coeff in ponderation.items():
-                row_values = row_values + var[:,node-1]*coeff
+                row_values = row_values + var[:,node_index[node]]*coeff
             values.loc[ptID,varID_list] = row_values
 
         if args.outpattern.endswith('.xls'):
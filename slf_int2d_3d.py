@@ -45,15 +45,14 @@ def int2d(resname, xyzname, varID_list, outCSV, overwrite=False, sep=',', digits
 
         # Read results
         first = True
-        for time in res.time:
-            var = res.read_vars_in_frame(time, varID_list)
+        for time, var in res.iter_frames(varID_list):
+            var = res.by_plane(var)  # shape = (nb var, nb plane, nb node 2D)
             df_var = pd.DataFrame(index=None, columns=None, dtype='float64')
 
             for ptID in points.index:
                 result = np.zeros((res.nplan, len(varID_list)))
                 for node, coeff in ponderation[ptID].items():
-                    nodes = [(node-1) + x*res.nnode2d for x in range(res.nplan)]  # 3D nodes -1
-                    result = result + coeff*(var[:,nodes].transpose())
+                    result = result + coeff*(var[:, :, node-1].transpose())  # 3D nodes above the 2D node
                 df_append = pd.DataFrame(result, columns=varID_list, dtype='float64')
 
                 # Add columns
@@ -44,6 +44,16 @@ with Serafin.Read(args.resname) as res:
 
     ponderations = res.compute_ponderations(points)
 
+    # Nodes involved in the interpolation (values are read only at these nodes)
+    nodes = sorted(set(node for _, ponderation in ponderations for node in ponderation))
+    node_index = {node: i for i, node in enumerate(nodes)}
+
+    # Interpolation matrix: shape = (nb points, nb nodes)
+    coeffs = np.zeros((len(ponderations), len(nodes)))
+    for i, (ptID, ponderation) in enumerate(ponderations):
+        for node, coeff in ponderation.items():
+            coeffs[i, node_index[node]] += coeff
+
     # Read results
     if varID_list is None: varID_list = res.varID
     for i, varID in enumerate(varID_list):
@@ -56,12 +66,9 @@ with Serafin.Read(args.resname) as res:
             a.writerow(header)
             float_fmt = '{:1.'+str(args.digits-1)+'e}'
 
-            for time in res.time:
-                var = res.read_var_in_frame(time, varID)
+            # Compute linear interpolation in a triangle for all frames
+            series = res.read_nodes(nodes, [varID])[:, 0, :]
+            values = np.dot(series, coeffs.T)  # shape = (nb frames, nb points)
 
-                # Compute linear interpolation in a triangle
-                values = [0] * len(points.index)
-                for i, (ptID, ponderation) in enumerate(ponderations):
-                    for node, coeff in ponderation.items():
-                        values[i] = values[i] + coeff*var[node-1]
-                a.writerow([time] + [float_fmt.format(x) for x in values])
+            for time, row in zip(res.time, values):
+                a.writerow([time] + [float_fmt.format(x) for x in row])
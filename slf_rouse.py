@@ -14,6 +14,8 @@ Ajouter des varibles supplémentaires pour l'interprétation hydro-sédimentaire
 * Les variables suivantes sont ajoutés :
     - CONTRAINTE (en Pa) = RHO_EAU * US^2
     - DMAX (en mm) selon trois zones basées sur TAU (bornes : 0.1 et 0.34)
+* Les enregistrements sont calculés en parallèle par plusieurs processus (option `--processes`) qui les écrivent
+  directement à leur position dans le fichier de sortie (pré-alloué)
 
 @warnings:
 Les variables US et H doivent exister
@@ -31,76 +33,34 @@ DEFAULT_VAR_PREFIX = 'SEDIMENT'
 DEFAULT_VALUE = -9999.
 RHO_EAU = 1000.  # kg/m3
 
-parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
-parser.add_argument("inname", help="Serafin input filename")
-parser.add_argument("outname", help="Serafin output filename")
-parser.add_argument("ws", help="Vitesses de chute (m/s)", type=float, nargs='+')
-parser.add_argument("--labels", help="Nom des variables (sans accents ou caractères spéciaux)", nargs='+')
-parser.add_argument("--h_corr", help="hauteur seuil pour correction (par défaut : 1cm)", type=float, default=0.01)
-args = parser.parse_args()
-
-common_data.verbose = args.verbose
-
-nb_sediments = len(args.ws)
-
-if args.labels is not None:
-    if len(args.ws) != len(args.labels):
-        sys.exit("Il n'y a pas {} noms de variables".len(nb_sediments))
-
-with Serafin.Read(args.inname) as resin:
-    resin.readHeader()
-    resin.get_time()
-    varIDs = deepcopy(resin.varID)  #FIXME: a supprimer lors du debuggage de copy_header avec des deepcopy??? Pb interference resout et resin
-
-    if resin.type != "2D":
-        sys.exit("ERREUR: Le fichier n'est pas un resultat 2D")
-    if 'US' not in resin.varID:
-        sys.exit("ERREUR: La variable US (vitesse de frottement) doit exister")
-    if 'H' not in resin.varID:
-        sys.exit("ERREUR: La variable H (hauteur d'eau) doit exister")
-
+def compute_frames(first, stop, inname, varIDs, ws_list, h_corr, nbvar_out):
+    """
+    @brief: compute frames of the output file at positions first to stop - 1 (task of a worker process)
+    @param varIDs <str list>: variables of the input file
+    @param ws_list <float list>: vitesses de chute (m/s)
+    @param h_corr <float>: hauteur seuil pour correction
+    @param nbvar_out <int>: nombre de variables du fichier de sortie
+    """
     pos_H = varIDs.index('H')
     pos_US = varIDs.index('US')
-    nbvar = resin._nbvar
-
-    with Serafin.Write(args.outname, args.force) as resout:
-        resout.copy_header(resin)
-
-        # Ajout des variables (S1, S2, ...)
-        for i, ws in enumerate(args.ws):
-            varname = DEFAULT_VAR_PREFIX + ' ' + str(i+1)
-            if args.labels is not None:
-                varname = args.labels[i]
-            if len(varname)>16:
-                sys.exit("ERREUR: Le nom de la variable est trop long (limite de 16 caractères): '{}'".format(varname))
-            resout.addVarID('S', varname)
-            print("Variable: '{}' (ws = {} m/s)".format(varname, ws))
-
-        # Ajout des variables TAU, DMAX
-        resout.addVarID('TAU', 'CONTRAINTE', 'PA')
-        resout.addVarID('DMAX', 'DIAMETRE', 'MM')
-
-        resout.compute_nbvar()
-
-        resout.write_header()
+    nbvar = len(varIDs)
 
-        time = resin.time[0]
-        var2write = np.empty([resout._nbvar, resout.nnode])
+    with Serafin.Read(inname) as resin:
+        resin.readHeader()
+        resin.get_time()
 
-        resout.time = []
-        for i, time in enumerate(resin.time):
+        var2write = np.empty([nbvar_out, resin.nnode], dtype=resin.dtype)
+        for time, var in resin.iter_frames(varIDs, range(first, stop)):
             # Copy existing variables
-            resout.time.append(time)
-            var = resin.read_vars_in_frame(time, varIDs)
             var2write[:nbvar,:] = var
 
             H = var[pos_H,:]
             US = var[pos_US,:]
-            correction = np.where((US == 0.) | (H <= args.h_corr))
+            correction = np.where((US == 0.) | (H <= h_corr))
             not_zero = np.where((US != 0.))  #FIXME: what happens if empty
 
             # Compute Rouse variables
-            for i, ws in enumerate(args.ws):
+            for i, ws in enumerate(ws_list):
                 pos_var = nbvar + i
                 var2write[pos_var,not_zero] = ws/(KARMAN*US[not_zero])
                 var2write[pos_var,correction] = DEFAULT_VALUE
@@ -127,5 +87,63 @@ with Serafin.Read(args.inname) as resin:
 
             var2write[pos_var,:] = DMAX
 
-            resout.write_entire_frame(time, var2write)
-        common_data.log("My work is done")
+            yield (time, var2write)
+
+
+if __name__ == '__main__':  # required by the pool of processes
+    parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
+    parser.add_argument("inname", help="Serafin input filename")
+    parser.add_argument("outname", help="Serafin output filename")
+    parser.add_argument("ws", help="Vitesses de chute (m/s)", type=float, nargs='+')
+    parser.add_argument("--labels", help="Nom des variables (sans accents ou caractères spéciaux)", nargs='+')
+    parser.add_argument("--h_corr", help="hauteur seuil pour correction (par défaut : 1cm)", type=float, default=0.01)
+    parser.add_argument("--processes", type=int, help="nombre de processus (par défaut : nombre de CPU, 4 au maximum)")
+    args = parser.parse_args()
+
+    common_data.verbose = args.verbose
+
+    nb_sediments = len(args.ws)
+
+    if args.labels is not None:
+        if len(args.ws) != len(args.labels):
+            sys.exit("Il n'y a pas {} noms de variables".len(nb_sediments))
+
+    with Serafin.Read(args.inname) as resin:
+        resin.readHeader()
+        resin.get_time()
+        varIDs = deepcopy(resin.varID)  #FIXME: a supprimer lors du debuggage de copy_header avec des deepcopy??? Pb interference resout et resin
+
+        if resin.type != "2D":
+            sys.exit("ERREUR: Le fichier n'est pas un resultat 2D")
+        if 'US' not in resin.varID:
+            sys.exit("ERREUR: La variable US (vitesse de frottement) doit exister")
+        if 'H' not in resin.varID:
+            sys.exit("ERREUR: La variable H (hauteur d'eau) doit exister")
+
+        # Frames are computed by worker processes which write them directly at their position in the output file
+        # (or by this process, with a background writer thread, if there is a single process)
+        with Serafin.Write(args.outname, args.force, queue_size=Serafin.WRITE_QUEUE_SIZE) as resout:
+            resout.copy_header(resin)
+
+            # Ajout des variables (S1, S2, ...)
+            for i, ws in enumerate(args.ws):
+                varname = DEFAULT_VAR_PREFIX + ' ' + str(i+1)
+                if args.labels is not None:
+                    varname = args.labels[i]
+                if len(varname)>16:
+                    sys.exit("ERREUR: Le nom de la variable est trop long (limite de 16 caractères): '{}'".format(varname))
+                resout.addVarID('S', varname)
+                print("Variable: '{}' (ws = {} m/s)".format(varname, ws))
+
+            # Ajout des variables TAU, DMAX
+            resout.addVarID('TAU', 'CONTRAINTE', 'PA')
+            resout.addVarID('DMAX', 'DIAMETRE', 'MM')
+
+            resout.compute_nbvar()
+
+            resout.write_header()
+
+            resout.time = list(resin.time)
+            Serafin.write_frames_in_parallel(resout, resin.nb_frame, compute_frames,
+                                             (args.inname, varIDs, args.ws, args.h_corr, resout._nbvar), args.processes)
+            common_data.log("My work is done")
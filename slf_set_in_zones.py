@@ -9,9 +9,16 @@ Les polygones peuvent se chevaucher mais le dernier polylgone lu écrasera les v
 
 @prerequisites:
 * La valeur des polygones est utilisée comme valeur de remplacement
+
+@features:
+* Modification sur place (si outname est identique à inname, avec l'option --force) : seules les valeurs des noeuds
+  dans les zones sont réécrites dans le fichier d'entrée
+* Avec l'option --snapshot, les valeurs écrasées sont sauvegardées dans un fichier `.undo` pour pouvoir restaurer le
+  fichier d'origine (avec slf.Serafin.restore_snapshot)
 """
 
 import numpy as np
+import os
 import sys
 import shapely.affinity as aff
 import shapely.geometry as geo
@@ -23,9 +30,10 @@ from slf import Serafin, common_data
 
 parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
 parser.add_argument("inname", help="Serafin input filename")
-parser.add_argument("outname", help="Serafin output filename")
+parser.add_argument("outname", help="Serafin output filename (inname to modify it in place)")
 parser.add_argument("i2s_name", help="BlueKenue 2D polyline file (i2s format)")
 parser.add_argument("--var", nargs='+', help="liste des variables 2D")
+parser.add_argument("--snapshot", help="save overwritten values to restore the file (in place modification only)", action="store_true")
 args = parser.parse_args()
 # class args:
 #     pass
@@ -39,6 +47,10 @@ args = parser.parse_args()
 
 common_data.verbose = args.verbose
 
+inplace = os.path.exists(args.outname) and os.path.samefile(args.outname, args.inname)
+if inplace and not args.force:
+    sys.exit("File {} would be modified in place (add the option --force and then re-run the program)".format(args.inname))
+
 class Mask:
     """
     Mask: definir une zone pour laquelle, les noeuds inclus dedans sont traités différement
@@ -54,7 +66,7 @@ class Mask:
         self.nodes_included = nodes_included
 
 
-with Serafin.Read(args.inname) as resin:
+with (Serafin.Patch(args.inname, snapshot=args.snapshot) if inplace else Serafin.Read(args.inname)) as resin:
     resin.readHeader()
 
     if resin.type != '2D':
@@ -98,17 +110,30 @@ with Serafin.Read(args.inname) as resin:
     var2D_pos = [resin.varID.index(x) for x in var2D_list]
     print(var2D_pos)
 
-    with Serafin.Write(args.outname, args.force) as resout:
-        resout.copy_header(resin)
-        resout.write_header()
+    if inplace:
+        # Only the values of the nodes in the zones are overwritten (the last zone is applied on overlaps)
+        included = np.zeros(resin.nnode, dtype=bool)
+        new_values = np.zeros(resin.nnode, dtype=resin.dtype)
+        for mask in masks:
+            included |= mask.nodes_included
+            new_values[mask.nodes_included] = mask.value
+        nodes = np.nonzero(included)[0] + 1
+
+        for pos in range(resin.nb_frame):
+            for varID in var2D_list:
+                resin.write_nodes_in_frame_at_pos(pos, varID, nodes, new_values[nodes - 1])
+    else:
+        with Serafin.Write(args.outname, args.force) as resout:
+            resout.copy_header(resin)
+            resout.write_header()
 
-        for time in resin.time:
-            var = resin.read_vars_in_frame(time, resout.varID)
+            for time in resin.time:
+                var = resin.read_vars_in_frame(time, resout.varID)
 
-            # Application aux zones
-            for pos in var2D_pos:
-                for mask in masks:
-                    var[pos,:][mask.nodes_included] = mask.value
+                # Application aux zones
+                for pos in var2D_pos:
+                    for mask in masks:
+                        var[pos,:][mask.nodes_included] = mask.value
 
-            resout.write_entire_frame(time, var)
+                resout.write_entire_frame(time, var)
 
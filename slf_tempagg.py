@@ -8,25 +8,29 @@ for the mean, a constant time step is compulsary!
 
 @info:
 Un seul enregistrement est exporté (avec le temps remis à zéro)
+inname and outname can be `-` to read from standard input and write on standard output (e.g. `slf_anal.py r2d.slf - --var2keep H | slf_tempagg.py - max.slf max`)
 """
 #FIXME: remove computation of UV @see slf_anal
 #TODO: add progressif max
 
 import copy
 import numpy as np
+import sys
 
 from common.arg_command_line import myargparse
 from slf import common_data, Serafin
 
 
 parser = myargparse(description=__doc__, add_args=['force', 'verbose'])
-parser.add_argument("inname", help="Serafin input filename")
-parser.add_argument("outname", help="Serafin output filename")
+parser.add_argument("inname", help="Serafin input filename (- for standard input)")
+parser.add_argument("outname", help="Serafin output filename (- for standard output)")
 parser.add_argument("fun", help="function among max, min and mean")
 parser.add_argument("--velMag", help="compute velocity 2D (or 3D) magnitude of a simple difference for U, V (and W)", action="store_true")
 args = parser.parse_args()
 
 common_data.verbose = args.verbose
+if args.outname == Serafin.STDIO:
+    common_data.log_file = sys.stderr  # standard output is kept for Serafin data
 OUTPUT_TIME = 0.0
 
 if   args.fun == 'max':  np_fun = np.maximum
@@ -53,28 +57,37 @@ with Serafin.Read(args.inname) as resin:
 
         resout.write_header()
 
-        values = np.array([], dtype='float64')
+        # U and V are read at the end of each block to compute the velocity magnitude
+        readVarID = normalVarID + ['U', 'V'] if args.velMag else normalVarID
+        nb_normal = len(normalVarID)
 
-        for i, time in enumerate(resin.time):
-            common_data.log("Compute {} for time {}".format(args.fun, time))
+        # Frames are processed by blocks (with a bounded memory size)
+        first = True
+        for times, block in resin.iter_frame_blocks(readVarID):
+            common_data.log("Compute {} for times {} to {}".format(args.fun, times[0], times[-1]))
 
-            # Compute simple differences for each variables
-            curVal = resin.read_vars_in_frame(time, normalVarID)
+            curVal = block[:, :nb_normal, :]
 
             if args.velMag:
-                # Compute velocity magnitude difference
-                U = resin.read_var_in_frame(time, 'U')
-                V = resin.read_var_in_frame(time, 'V')
+                # Compute velocity magnitude
+                U = block[:, nb_normal, :]
+                V = block[:, nb_normal + 1, :]
                 if resin.type == '2D':
                     V2D = np.sqrt(np.power(U, 2) + np.power(V, 2))
-                    curVal = np.vstack((curVal, V2D))
+                    curVal = np.concatenate((curVal, V2D[:, np.newaxis, :]), axis=1)
                 elif resin.type == '3D':
                     raise Exception("TODO: 3D velocity")
 
-            if i == 0: values = curVal
-            else: values = np_fun(curVal, values)
+            # Sum for the mean is accumulated in double precision (a single frame in memory)
+            if args.fun == 'mean': curVal = np_fun.reduce(curVal, axis=0, dtype='float64')
+            else: curVal = np_fun.reduce(curVal, axis=0)
 
-        if args.fun == 'mean': values = values/len(resin.time)
+            if first:
+                values = curVal
+                first = False
+            else: np_fun(curVal, values, out=values)
+
+        if args.fun == 'mean': values = (values/len(resin.time)).astype(resin.dtype)
 
         # Write a single frame with t=0s
         resout.write_entire_frame(OUTPUT_TIME, values)
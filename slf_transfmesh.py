@@ -51,7 +51,5 @@ with Serafin.Read(args.inname) as resin:
 
         resout.write_header()
 
-        # Write all frames
-        for time in resin.time:
-            var = resin.read_vars_in_frame(time, resout.varID)
-            resout.write_entire_frame(time, var)
+        # Copy all frames (values are not modified)
+        resout.copy_frames(resin)